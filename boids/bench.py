@@ -0,0 +1,77 @@
+import argparse
+import json
+import sys
+from boids import Simulation
+from headless import run, format_result
+
+SIZES = (50, 200, 1000, 5000, 10000, 50000, 100000)
+STEP_BUDGET = 20000  # Boid updates per measurement, so small flocks get more steps than big ones
+MAX_STEP_MS = 2000  # Once a step takes longer than this, bigger flocks are skipped for that engine
+
+
+# Times every engine on every flock size and returns the results
+def sweep(sizes, engines, seed=0, neighbor_mode='radius'):
+    results = []
+
+    for engine in engines:
+        for count in sizes:
+            steps = max(3, min(100, STEP_BUDGET // count))
+            run(count, 1, engine, seed, neighbor_mode=neighbor_mode)  # Warm up caches and imports
+            result = run(count, steps, engine, seed, neighbor_mode=neighbor_mode)
+            results.append(result)
+            print(format_result(result), flush=True)
+
+            if 1000 / result['steps_per_sec'] > MAX_STEP_MS:
+                print(f'{engine:>8} skipping bigger flocks', flush=True)
+                break
+
+    return results
+
+
+# Returns the (engine, count) runs that got slower than the baseline by more than the tolerance
+def find_regressions(results, baseline, tolerance):
+    baseline_speed = {(r['engine'], r['count']): r['steps_per_sec'] for r in baseline}
+    regressions = []
+
+    for result in results:
+        expected = baseline_speed.get((result['engine'], result['count']))
+        if expected is not None and result['steps_per_sec'] < expected * (1 - tolerance):
+            regressions.append((result['engine'], result['count'], expected, result['steps_per_sec']))
+
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the boids update engines over a range of flock sizes')
+    parser.add_argument('--sizes', type=int, nargs='+', default=SIZES)
+    parser.add_argument('--engines', nargs='+', choices=Simulation.ENGINES, default=Simulation.ENGINES)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--neighbors', choices=Simulation.NEIGHBOR_MODES, default='radius')
+    parser.add_argument('--save', help='write the results to this JSON file')
+    parser.add_argument('--compare', help='JSON file from a previous --save to check for regressions against')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='allowed slowdown against --compare')
+    args = parser.parse_args()
+
+    engines = args.engines
+    if args.neighbors != 'radius':
+        engines = [engine for engine in engines if engine != 'parallel']
+
+    results = sweep(args.sizes, engines, args.seed, args.neighbors)
+
+    if args.save:
+        with open(args.save, 'w') as file:
+            json.dump(results, file, indent=2)
+
+    if args.compare:
+        with open(args.compare) as file:
+            regressions = find_regressions(results, json.load(file), args.tolerance)
+
+        for engine, count, expected, actual in regressions:
+            print(f'REGRESSION {engine} {count} boids: {actual:.1f} steps/s, baseline {expected:.1f} steps/s')
+
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -3,6 +3,16 @@ import random
 import pygame as pg
 from pygame import gfxdraw
 import globals
+from spatial import SpatialGrid, knn_neighbors
+from flock import Flock
+from parallel import ParallelFlock
+import numpy as np
+from timing import PhaseTimer, FixedTimestep
+from render import SpriteAtlas, Camera, plot_points
+from profiling import FrameProfiler
+from recording import TrajectoryRecorder, Trajectory
+from obstacles import Obstacles, RepulsionField
+from pipeline import SimulationPipeline
 
 class Boid:
     COLOR = pg.color.Color('white')
@@ -17,23 +27,46 @@ class Boid:
     BORDER_REPULSION = 5
     BORDER_TRESHOLD = 90
     MAX_VELOCITY = 50
+    KNN_NEIGHBORS = 7  # Flockmates each boid reacts to in the 'knn' neighbor mode
 
-    def __init__(self):
-        self.x = random.randint(0, screen.width)
-        self.y = random.randint(0, screen.height)
-        self.velx = random.randint(-self.START_VEL, self.START_VEL)
-        self.vely = random.randint(-self.START_VEL, self.START_VEL)
+    ANGLE_STEPS = 360  # Number of pre-rotated sprites, see get_atlas
+    atlas = None
+
+    def __init__(self, width, height, rng=random):
+        self.x = rng.randint(0, width)
+        self.y = rng.randint(0, height)
+        self.velx = rng.randint(-self.START_VEL, self.START_VEL)
+        self.vely = rng.randint(-self.START_VEL, self.START_VEL)
         self.angle = 0
 
-        self.orig_surf = pg.Surface((self.HEIGHT, self.WIDTH))
-        self.orig_surf.set_colorkey(pg.color.Color('black'))
+    @classmethod
+    def create_surface(cls):
+        surf = pg.Surface((cls.HEIGHT, cls.WIDTH))
+        surf.set_colorkey(pg.color.Color('black'))
+
+        # Draw antialiased triangle on the surface
+        pg.gfxdraw.aatrigon(surf, 0, 0, 0, cls.WIDTH, cls.HEIGHT - 1, cls.WIDTH // 2, cls.COLOR)
+        pg.gfxdraw.filled_trigon(surf, 0, 1, 0, cls.WIDTH - 1, cls.HEIGHT - 2, cls.WIDTH // 2, cls.COLOR)
+        return surf
 
-        # Draw antialiased triangle on orig_surf
-        pg.gfxdraw.aatrigon(self.orig_surf, 0, 0, 0, self.WIDTH, self.HEIGHT - 1, self.WIDTH // 2, self.COLOR)
-        pg.gfxdraw.filled_trigon(self.orig_surf, 0, 1, 0, self.WIDTH - 1, self.HEIGHT - 2, self.WIDTH // 2, self.COLOR)
+    # Returns the triangle pre-rotated at ANGLE_STEPS angles, built on first use and shared by every boid.
+    # Headless runs never draw, so they never build it
+    @classmethod
+    def get_atlas(cls):
+        if Boid.atlas is None:
+            Boid.atlas = SpriteAtlas(cls.create_surface(), cls.ANGLE_STEPS)
+        return Boid.atlas
 
-    def update(self):
-        nearest = list(filter(lambda x: self.distance_to(x) <= self.VIEW_RADIUS, boids))
+    # Returns the acceleration of this boid. Only reads the flock, so every boid of a step sees the same state.
+    # nearest is a list of (boid, distance) pairs including this boid, by default every boid within VIEW_RADIUS
+    def get_acceleration(self, sim, nearest=None):
+        if nearest is None:
+            # Only boids in the adjacent grid cells can be within the view radius
+            nearest = []
+            for other in sim.grid.nearby(self.x, self.y):
+                dist_to_other = self.distance_to(other)
+                if dist_to_other <= self.VIEW_RADIUS:
+                    nearest.append((other, dist_to_other))
 
         direction_sum_x = 0
         direction_sum_y = 0
@@ -42,7 +75,7 @@ class Boid:
         accx = 0
         accy = 0
 
-        for other in nearest:
+        for other, dist_to_other in nearest:
             if other == self:
                 continue
 
@@ -57,11 +90,10 @@ class Boid:
             sum_y += other.y
 
             # Add repulsion force from neighbors
-            dist_to_other = self.distance_to(other)
             if dist_to_other != 0:
-                repulsion_force = self.SEPARATION / self.distance_to(other)
-                accx += repulsion_force * ((self.x - other.x) / self.distance_to(other))
-                accy += repulsion_force * ((other.y - self.y) / self.distance_to(other))
+                repulsion_force = self.SEPARATION / dist_to_other
+                accx += repulsion_force * ((self.x - other.x) / dist_to_other)
+                accy += repulsion_force * ((other.y - self.y) / dist_to_other)
 
         if len(nearest) > 1:
             # Add alignment force
@@ -72,22 +104,21 @@ class Boid:
             avg_x = sum_x / len(nearest)
             avg_y = sum_y / len(nearest)
             dist_to_avg = math.sqrt((avg_x - self.x) ** 2 + (avg_y - self.y) ** 2)
-            accx += self.COHESION * ((avg_x - self.x) / dist_to_avg)
-            accy += self.COHESION * ((self.y - avg_y) / dist_to_avg)
+            if dist_to_avg != 0:
+                accx += self.COHESION * ((avg_x - self.x) / dist_to_avg)
+                accy += self.COHESION * ((self.y - avg_y) / dist_to_avg)
 
-        # Add repulsion force from borders
-        if screen.width - self.x < self.BORDER_TRESHOLD:
-            accx -= self.BORDER_REPULSION
-        elif self.x < self.BORDER_TRESHOLD:
-            accx += self.BORDER_REPULSION
+        # Add repulsion force from borders and obstacles
+        force_x, force_y = sim.field.get_force(self.x, self.y)
+        accx += force_x
+        accy += force_y
 
-        if screen.height - self.y < self.BORDER_TRESHOLD:
-            accy += self.BORDER_REPULSION
-        elif self.y < self.BORDER_TRESHOLD:
-            accy -= self.BORDER_REPULSION
+        return accx, accy
 
-        self.velx += accx
-        self.vely += accy
+    # Applies an acceleration, limits the velocity and moves the boid
+    def apply(self, acc, delta_time):
+        self.velx += acc[0]
+        self.vely += acc[1]
 
         # Limit the velocity magnitude
         velocity = self.get_velocity()
@@ -106,40 +137,318 @@ class Boid:
     def get_velocity(self):
         return math.sqrt(self.velx ** 2 + self.vely ** 2)
 
-    def draw(self):
-        # Rotate the surface around its center
-        rotated_surf = pg.transform.rotate(self.orig_surf, self.angle)
-        new_rect = rotated_surf.get_rect(center=(self.x, self.y))
-        screen.blit(rotated_surf, new_rect)
 
-# Setup
-pg.init()
-pg.display.set_caption('Boids')
-screen = pg.display.set_mode((1000, 800))
-running = True
-delta_time = 0.1
-clock = pg.time.Clock()
+# Owns the flock and advances it with one of the update engines, independently of any window
+class Simulation:
+    # 'object' updates one Boid at a time, 'numpy' steps the whole flock with array operations
+    # and 'parallel' splits the array operations across one worker process per core
+    ENGINES = ('object', 'numpy', 'parallel')
+    # 'radius' reacts to every boid within Boid.VIEW_RADIUS, 'knn' to the Boid.KNN_NEIGHBORS nearest ones,
+    # which keeps the cost per boid bounded in dense clusters
+    NEIGHBOR_MODES = ('radius', 'knn')
+
+    # rules is the Boid class, or a subclass overriding its flocking constants
+    def __init__(self, count, width, height, engine='object', seed=None, neighbor_mode='radius', rules=Boid,
+                 obstacles=None, toroidal=False):
+        if engine not in self.ENGINES:
+            raise ValueError(f'Unknown engine {engine!r}, expected one of {self.ENGINES}')
+        if neighbor_mode not in self.NEIGHBOR_MODES:
+            raise ValueError(f'Unknown neighbor mode {neighbor_mode!r}, expected one of {self.NEIGHBOR_MODES}')
+        if engine == 'parallel' and neighbor_mode != 'radius':
+            raise ValueError('The parallel engine only supports the radius neighbor mode')
+        if toroidal and engine != 'numpy':
+            raise ValueError('Only the numpy engine supports toroidal worlds')
+
+        self.count = count
+        self.width = width
+        self.height = height
+        self.engine = engine
+        self.neighbor_mode = neighbor_mode
+        self.rules = rules
+        self.obstacles = obstacles
+        self.toroidal = toroidal
+        # A toroidal world has no borders to keep the boids away from
+        self.field = RepulsionField(width, height, rules, obstacles, borders=not toroidal)
+        self.grid = SpatialGrid(rules.VIEW_RADIUS)
+        self.timer = PhaseTimer()
+        self.flock = None
+        # Only the object engine has Boid objects. The numpy and parallel engines are drawn from the arrays
+        # of get_state, so they keep no per-boid views over the flock
+        self.boids = []
+        self.reset(seed)
+
+    # Spawns a new flock
+    def reset(self, seed=None):
+        self.close()
+        self.seed = seed
+
+        if self.engine in ('numpy', 'parallel'):
+            if self.engine == 'parallel':
+                self.flock = ParallelFlock(self.count, self.width, self.height, self.rules, seed, field=self.field)
+            else:
+                self.flock = Flock(self.count, self.width, self.height, self.rules, seed, self.neighbor_mode,
+                                   self.field, self.toroidal)
+        else:
+            rng = random.Random(seed)
+            self.boids = [self.rules(self.width, self.height, rng) for _ in range(self.count)]
+
+    # Advances the flock by one step, timing each phase in self.timer.
+    # Every acceleration is computed from the flock as it was before the step and only then applied,
+    # so the result does not depend on the order of the boids
+    def step(self, delta_time):
+        if self.engine == 'parallel':
+            with self.timer.phase('forces'):
+                acc = self.flock.get_accelerations()
+            with self.timer.phase('integrate'):
+                self.flock.integrate(acc, delta_time)
+        elif self.engine == 'numpy':
+            with self.timer.phase('neighbors'):
+                neighbors = self.flock.get_neighbors()
+            with self.timer.phase('forces'):
+                acc = self.flock.get_accelerations(neighbors)
+            with self.timer.phase('integrate'):
+                self.flock.integrate(acc, delta_time)
+        elif self.neighbor_mode == 'knn':
+            with self.timer.phase('neighbors'):
+                nearest = self.get_nearest_boids()
+            with self.timer.phase('forces'):
+                accelerations = [boid.get_acceleration(self, near) for boid, near in zip(self.boids, nearest)]
+            with self.timer.phase('integrate'):
+                for boid, acc in zip(self.boids, accelerations):
+                    boid.apply(acc, delta_time)
+        else:
+            with self.timer.phase('neighbors'):
+                self.grid.rebuild(self.boids)
+            with self.timer.phase('forces'):
+                accelerations = [boid.get_acceleration(self) for boid in self.boids]
+            with self.timer.phase('integrate'):
+                for boid, acc in zip(self.boids, accelerations):
+                    boid.apply(acc, delta_time)
+
+    # Returns the KNN_NEIGHBORS nearest flockmates of every boid in the form Boid.get_acceleration expects
+    def get_nearest_boids(self):
+        pos = np.array([(boid.x, boid.y) for boid in self.boids], dtype=np.float64).reshape(-1, 2)
+        indices, distances = knn_neighbors(pos, self.rules.KNN_NEIGHBORS)
+        boids = self.boids
+
+        return [[(boid, 0.0)] + [(boids[j], dist) for j, dist in zip(row_indices, row_distances)]
+                for boid, row_indices, row_distances in zip(boids, indices.tolist(), distances.tolist())]
+
+    # Returns every boid's x, y and angle as arrays that stay valid after the next step
+    def get_state(self):
+        if self.flock is not None:
+            return self.flock.pos[:, 0].copy(), self.flock.pos[:, 1].copy(), self.flock.angle.copy()
+
+        return (np.array([boid.x for boid in self.boids], dtype=np.float64),
+                np.array([boid.y for boid in self.boids], dtype=np.float64),
+                np.array([boid.angle for boid in self.boids], dtype=np.float64))
+
+    # Returns every boid's velocity as x and y arrays that stay valid after the next step
+    def get_velocities(self):
+        if self.flock is not None:
+            return self.flock.vel[:, 0].copy(), self.flock.vel[:, 1].copy()
+
+        return (np.array([boid.velx for boid in self.boids], dtype=np.float64),
+                np.array([boid.vely for boid in self.boids], dtype=np.float64))
+
+    # Draws every boid of a state from get_state with one batched blit. With a previous state, the boids are drawn
+    # at alpha between it (0) and the state (1). With a camera, only the boids in its view are drawn,
+    # as single pixels once it is zoomed out below lod_zoom
+    def draw_state(self, screen, state, previous=None, alpha=1.0, camera=None, lod_zoom=0):
+        with self.timer.phase('sprites'):
+            xs, ys, angles = state
+
+            if previous is not None and alpha < 1:
+                prev_xs, prev_ys, prev_angles = previous
+                dx = xs - prev_xs
+                dy = ys - prev_ys
+                if self.toroidal:
+                    # Boids that wrapped around moved the short way, not across the whole world
+                    dx = (dx + self.width / 2) % self.width - self.width / 2
+                    dy = (dy + self.height / 2) % self.height - self.height / 2
+                xs = prev_xs + dx * alpha
+                ys = prev_ys + dy * alpha
+                # Turn the short way around when crossing from 180 to -180 degrees
+                angles = prev_angles + ((angles - prev_angles + 180) % 360 - 180) * alpha
+
+            if camera is not None:
+                visible, xs, ys = camera.cull(xs, ys, margin=Boid.HEIGHT)
+                angles = angles[visible]
+                if camera.zoom < lod_zoom:
+                    with self.timer.phase('blit'):
+                        plot_points(screen, xs, ys, Boid.COLOR)
+                    return
+
+            blits = Boid.get_atlas().get_blits(xs, ys, angles)
+
+        with self.timer.phase('blit'):
+            screen.fblits(blits)
+
+    # Releases the worker processes and shared memory of the parallel engine
+    def close(self):
+        if isinstance(self.flock, ParallelFlock):
+            self.flock.close()
+
+
+# Plays a recorded trajectory back through the same interface as Simulation. Frames are streamed from the
+# memory-mapped file instead of simulated, at the speed they were recorded at whatever delta time steps it
+class ReplaySimulation(Simulation):
+    def __init__(self, path):
+        self.trajectory = Trajectory(path)
+        if not len(self.trajectory):
+            raise ValueError(f'{path} has no frames to replay')
+
+        self.count = self.trajectory.count
+        self.seed = self.trajectory.seed
+        self.width = self.trajectory.width
+        self.height = self.trajectory.height
+        self.engine = 'replay'
+        self.timer = PhaseTimer()
+        self.flock = None
+        self.boids = []
+        self.obstacles = None
+        self.toroidal = self.trajectory.toroidal
+        self.position = 0.0
+
+    # Goes back to the first frame
+    def reset(self, seed=None):
+        self.position = 0.0
+
+    # Moves forward by delta_time, holding the last frame once the recording ends
+    def step(self, delta_time):
+        with self.timer.phase('replay'):
+            self.position = min(self.position + delta_time / self.trajectory.delta_time, len(self.trajectory) - 1)
+
+    def get_frame(self):
+        return self.trajectory[int(self.position)]
+
+    def get_state(self):
+        frame = self.get_frame()
+        return frame[:, 0].astype(np.float64), frame[:, 1].astype(np.float64), frame[:, 4].astype(np.float64)
+
+    def get_velocities(self):
+        frame = self.get_frame()
+        return frame[:, 2].astype(np.float64), frame[:, 3].astype(np.float64)
+
+    def close(self):
+        self.trajectory.close()
+
 
 COUNT = 50
-boids = [Boid() for _ in range(COUNT)]
+ENGINE = 'object'  # One of Simulation.ENGINES
+NEIGHBOR_MODE = 'radius'  # One of Simulation.NEIGHBOR_MODES
+STEP_RATE = 60  # Simulation steps per second of real time, independent of the frame rate
+MAX_SUBSTEPS = 5  # Most steps run in one frame to catch up before the simulation slows down instead
+FPS = 60
+FRAME_LOG = None  # Path of a .csv or .json (one object per line) file to write every frame's phase times to
+PROFILED_PHASES = ('neighbors', 'forces', 'integrate', 'sprites', 'blit', 'flip', 'wait')
+RECORD = None  # Path of a trajectory file to append every step to
+REPLAY = None  # Path of a trajectory file to play back instead of simulating
+OBSTACLES = None  # Path of a JSON file of obstacles, see obstacles.Obstacles
+PIPELINED = False  # Simulate the next frame on a worker thread while rendering the current one
+WORLD_SIZE = None  # Width and height of the world, or None to fit it to the window
+TOROIDAL = False  # Wrap the world's edges around instead of repelling the boids from them (numpy engine only)
+LOD_ZOOM = 0.5  # Below this camera zoom, boids are drawn as single pixels instead of sprites
+
+
+def main():
+    pg.init()
+    pg.display.set_caption('Boids')
+    screen = pg.display.set_mode((1000, 800))
+    running = True
+    rendering = True
+    clock = pg.time.Clock()
+    timestep = FixedTimestep(STEP_RATE, MAX_SUBSTEPS)
+    # The simulation counts time in tenths of a second
+    delta_time = timestep.interval * 10
+
+    if REPLAY is not None:
+        sim = ReplaySimulation(REPLAY)
+    else:
+        obstacles = Obstacles.load(OBSTACLES) if OBSTACLES is not None else None
+        width, height = WORLD_SIZE if WORLD_SIZE is not None else screen.size
+        sim = Simulation(COUNT, width, height, ENGINE, neighbor_mode=NEIGHBOR_MODE, obstacles=obstacles,
+                         toroidal=TOROIDAL)
+    camera = Camera(screen.size, (sim.width, sim.height), sim.toroidal)
+    dragging = False
+    previous = current = sim.get_state()
+    profiler = FrameProfiler(sim.timer, PROFILED_PHASES, log_path=FRAME_LOG)
+    recorder = TrajectoryRecorder(RECORD, sim.count, delta_time, sim.seed, sim.width, sim.height, sim.toroidal) \
+        if RECORD is not None else None
+
+    def step():
+        sim.step(delta_time)
+        if recorder is not None:
+            recorder.write(sim)
+
+    pipeline = SimulationPipeline(sim, step) if PIPELINED else None
+
+    def render(state, previous, alpha):
+        screen.fill(globals.bg_color)
+        if not camera.toroidal:
+            pg.draw.rect(screen, Boid.COLOR, (*camera.world_to_screen(0, 0),
+                                              camera.world_width * camera.zoom, camera.world_height * camera.zoom), 1)
+        if sim.obstacles is not None:
+            sim.obstacles.draw(screen, (camera.x, camera.y), camera.zoom)
+        sim.draw_state(screen, state, previous, alpha, camera, LOD_ZOOM)
+        profiler.draw(screen)
+        with sim.timer.phase('flip'):
+            pg.display.flip()
+
+    while running:
+        if rendering and pipeline is not None:
+            # Simulate frame N + 1 in the background while frame N is drawn from its snapshot
+            pipeline.submit(timestep.advance(clock.tick(FPS) / 1000))
+            render(current, previous, timestep.alpha)
+            with sim.timer.phase('wait'):
+                stepped_from, current = pipeline.get()
+            if stepped_from is not None:
+                previous = stepped_from
+        elif rendering:
+            for _ in range(timestep.advance(clock.tick(FPS) / 1000)):
+                previous = sim.get_state()
+                step()
 
-while running:
-    screen.fill(globals.bg_color)
+            render(sim.get_state(), previous, timestep.alpha)
+        else:
+            # Without rendering there is nothing to wait for, so the simulation runs as fast as it can
+            step()
 
-    for boid in boids:
-        boid.update()
-        boid.draw()
+        profiler.end_frame()
 
-    pg.display.flip()
+        for event in pg.event.get():
+            if event.type == pg.QUIT:
+                running = False
+            if event.type == pg.KEYDOWN:
+                if event.key == pg.K_r:
+                    sim.reset()
+                    previous = current = sim.get_state()
+                elif event.key == pg.K_d:
+                    rendering = not rendering
+                    pg.display.set_caption('Boids' if rendering else 'Boids (rendering off)')
+                    previous = current = sim.get_state()
+                    clock.tick()
+                elif event.key == pg.K_F3:
+                    profiler.visible = not profiler.visible
+                elif event.key == pg.K_HOME:
+                    camera.fit()
+            if event.type == pg.MOUSEWHEEL:
+                camera.zoom_at(1.25 ** event.y, *pg.mouse.get_pos())
+            if event.type == pg.MOUSEBUTTONDOWN and event.button == 1:
+                dragging = True
+            if event.type == pg.MOUSEBUTTONUP and event.button == 1:
+                dragging = False
+            if event.type == pg.MOUSEMOTION and dragging:
+                camera.pan(*event.rel)
 
-    delta_time = clock.tick(60) / 100
-    delta_time = min(1.0, delta_time)
+    if pipeline is not None:
+        pipeline.close()
+    if recorder is not None:
+        recorder.close()
+    profiler.close()
+    sim.close()
+    pg.quit()
 
-    for event in pg.event.get():
-        if event.type == pg.QUIT:
-            running = False
-        if event.type == pg.KEYDOWN:
-            if event.key == pg.K_r:
-                boids = [Boid() for _ in range(COUNT)]
 
-pg.quit()
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,100 @@
+import numpy as np
+from spatial import neighbor_pairs, knn_pairs, get_offsets
+from obstacles import RepulsionField
+
+
+# Vectorized flock engine storing every boid's state in contiguous arrays instead of one object per boid.
+# The flocking constants are read from `rules`, any object with the same attributes as Boid (usually Boid itself).
+# neighbor_mode is 'radius' to react to every boid within VIEW_RADIUS or 'knn' for the KNN_NEIGHBORS nearest ones.
+# field is the RepulsionField of the borders and obstacles, by default one for the borders only.
+# A toroidal flock has no borders: boids leaving one edge come back on the other and see flockmates across it
+class Flock:
+    def __init__(self, count, width, height, rules, seed=None, neighbor_mode='radius', field=None, toroidal=False):
+        self.width = width
+        self.height = height
+        self.rules = rules
+        self.neighbor_mode = neighbor_mode
+        self.wrap = (width, height) if toroidal else None
+        self.field = field if field is not None else RepulsionField(width, height, rules, borders=not toroidal)
+
+        rng = np.random.default_rng(seed)
+        self.pos = np.column_stack((rng.integers(0, width, count, endpoint=True),
+                                    rng.integers(0, height, count, endpoint=True))).astype(np.float64)
+        self.vel = rng.integers(-rules.START_VEL, rules.START_VEL, (count, 2), endpoint=True).astype(np.float64)
+        self.angle = np.zeros(count)
+        if self.wrap is not None:
+            self.pos %= self.wrap
+
+    def __len__(self):
+        return len(self.pos)
+
+    # Returns the neighbor pairs of the current positions, see spatial.neighbor_pairs
+    def get_neighbors(self):
+        if self.neighbor_mode == 'knn':
+            return knn_pairs(self.pos, self.rules.KNN_NEIGHBORS, self.wrap)
+
+        return neighbor_pairs(self.pos, self.rules.VIEW_RADIUS, self.wrap)
+
+    # Returns the acceleration of every boid, see get_accelerations below
+    def get_accelerations(self, neighbors=None):
+        if neighbors is None:
+            neighbors = self.get_neighbors()
+
+        return get_accelerations(self.pos, self.vel, neighbors, self.rules, self.field, self.wrap)
+
+    # Applies the accelerations, limits the velocities and moves every boid
+    def integrate(self, acc, delta_time):
+        self.vel += acc
+
+        # Limit the velocity magnitude
+        speed = np.hypot(self.vel[:, 0], self.vel[:, 1])
+        too_fast = speed > self.rules.MAX_VELOCITY
+        self.vel[too_fast] *= (self.rules.MAX_VELOCITY / speed[too_fast])[:, None]
+
+        self.pos[:, 0] += self.vel[:, 0] * delta_time
+        self.pos[:, 1] -= self.vel[:, 1] * delta_time
+        if self.wrap is not None:
+            self.pos %= self.wrap
+        self.angle = np.degrees(np.arctan2(self.vel[:, 1], self.vel[:, 0]))
+
+
+# Returns the acceleration of every boid, mirroring the forces of Boid.get_acceleration.
+# neighbors are the pairs returned by spatial.neighbor_pairs for pos, wrap the size of a toroidal world
+def get_accelerations(pos, vel, neighbors, rules, field, wrap=None):
+    n = len(pos)
+    x, y = pos[:, 0], pos[:, 1]
+    i, j, dist = neighbors
+    # Neighbor positions as seen from each boid, which differs from their stored position across a toroidal edge
+    dx, dy = get_offsets(pos, i, j, wrap)
+    other_x = x[i] + dx
+    other_y = y[i] + dy
+
+    # The boid itself counts as one of its neighbors when averaging, as in Boid.get_acceleration
+    count = np.bincount(i, minlength=n) + 1
+    acc = np.zeros((n, 2))
+
+    # Repulsion from neighbors, skipping neighbors at the exact same position
+    apart = dist != 0
+    ri, rdist = i[apart], dist[apart]
+    acc[:, 0] += np.bincount(ri, -rules.SEPARATION * dx[apart] / rdist ** 2, n)
+    acc[:, 1] += np.bincount(ri, rules.SEPARATION * dy[apart] / rdist ** 2, n)
+
+    # Alignment with the average direction of neighbors
+    speed = np.hypot(vel[:, 0], vel[:, 1])
+    direction = np.divide(vel, speed[:, None], out=np.zeros_like(vel), where=speed[:, None] != 0)
+    acc[:, 0] += rules.ALIGNMENT * np.bincount(i, direction[j, 0], n) / count
+    acc[:, 1] += rules.ALIGNMENT * np.bincount(i, direction[j, 1], n) / count
+
+    # Cohesion towards the average position of neighbors
+    has_neighbors = count > 1
+    avg_x = np.bincount(i, other_x, n) / count
+    avg_y = np.bincount(i, other_y, n) / count
+    dist_to_avg = np.hypot(avg_x - x, avg_y - y)
+    pulled = has_neighbors & (dist_to_avg != 0)
+    acc[pulled, 0] += rules.COHESION * (avg_x - x)[pulled] / dist_to_avg[pulled]
+    acc[pulled, 1] += rules.COHESION * (y - avg_y)[pulled] / dist_to_avg[pulled]
+
+    # Repulsion from borders and obstacles
+    acc += field.sample(pos)
+
+    return acc
@@ -0,0 +1,76 @@
+import argparse
+import math
+import time
+from boids import Simulation, COUNT
+from recording import TrajectoryRecorder
+from obstacles import Obstacles
+
+WINDOW_SIZE = (1000, 800)
+DELTA_TIME = 0.16  # What the window loop uses when running at 60 fps
+
+
+# Returns a world size with the same boid density as COUNT boids in the window, so big flocks don't collapse
+# into one giant cluster where every boid sees every other
+def scaled_world_size(count):
+    scale = max(1.0, math.sqrt(count / COUNT))
+    return int(WINDOW_SIZE[0] * scale), int(WINDOW_SIZE[1] * scale)
+
+
+# Runs the simulation without a window and returns its throughput and the average time per step of each phase.
+# With a record path, every step is also written to a trajectory file that boids.py can replay
+def run(count, steps, engine='object', seed=0, world_size=None, delta_time=DELTA_TIME, neighbor_mode='radius',
+        record=None, obstacles=None, toroidal=False):
+    width, height = world_size or scaled_world_size(count)
+    sim = Simulation(count, width, height, engine, seed, neighbor_mode, obstacles=obstacles, toroidal=toroidal)
+    recorder = TrajectoryRecorder(record, count, delta_time, seed, width, height, toroidal) \
+        if record is not None else None
+
+    start = time.perf_counter()
+    for _ in range(steps):
+        sim.step(delta_time)
+        if recorder is not None:
+            with sim.timer.phase('record'):
+                recorder.write(sim)
+    elapsed = time.perf_counter() - start
+
+    if recorder is not None:
+        recorder.close()
+    sim.close()
+
+    return {
+        'engine': engine,
+        'count': count,
+        'steps': steps,
+        'steps_per_sec': steps / elapsed,
+        'phases_ms': {name: total * 1000 / steps for name, total in sim.timer.totals.items()},
+    }
+
+
+def format_result(result):
+    phases = '  '.join(f'{name} {ms:.2f}ms' for name, ms in result['phases_ms'].items())
+    return f'{result["engine"]:>8} {result["count"]:>7} boids  {result["steps_per_sec"]:9.1f} steps/s  {phases}'
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Step the boids simulation without a window and time it')
+    parser.add_argument('--count', type=int, default=COUNT)
+    parser.add_argument('--steps', type=int, default=100)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--engine', choices=Simulation.ENGINES, default='object')
+    parser.add_argument('--neighbors', choices=Simulation.NEIGHBOR_MODES, default='radius')
+    parser.add_argument('--dt', type=float, default=DELTA_TIME)
+    parser.add_argument('--record', help='write every step to this trajectory file')
+    parser.add_argument('--obstacles', help='JSON file of obstacles, see obstacles.Obstacles')
+    parser.add_argument('--toroidal', action='store_true', help='wrap the world edges around (numpy engine only)')
+    parser.add_argument('--width', type=int, help='world width, scaled with --count by default')
+    parser.add_argument('--height', type=int, help='world height, scaled with --count by default')
+    args = parser.parse_args()
+
+    world_size = (args.width, args.height) if args.width and args.height else None
+    obstacles = Obstacles.load(args.obstacles) if args.obstacles else None
+    print(format_result(run(args.count, args.steps, args.engine, args.seed, world_size, args.dt, args.neighbors,
+                            args.record, obstacles, args.toroidal)))
+
+
+if __name__ == '__main__':
+    main()
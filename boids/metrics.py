@@ -0,0 +1,44 @@
+import numpy as np
+from spatial import neighbor_pairs, knn_neighbors
+
+
+# Length of the average heading: 1 when every boid flies the same way, close to 0 when headings are random
+def polarization(vel):
+    speed = np.hypot(vel[:, 0], vel[:, 1])
+    moving = speed > 0
+    if not moving.any():
+        return 0.0
+
+    return float(np.hypot(*(vel[moving] / speed[moving, None]).mean(axis=0)))
+
+
+# Average distance from every boid to its nearest flockmate
+def mean_nearest_distance(pos):
+    if len(pos) < 2:
+        return 0.0
+
+    _, dist = knn_neighbors(pos, 1)
+    return float(dist.mean())
+
+
+# Number of groups of boids linked by chains of flockmates within radius of each other
+def cluster_count(pos, radius):
+    n = len(pos)
+    if n == 0:
+        return 0
+
+    from scipy.sparse import coo_matrix
+    from scipy.sparse.csgraph import connected_components
+
+    i, j, _ = neighbor_pairs(pos, radius)
+    graph = coo_matrix((np.ones(len(i), dtype=np.int8), (i, j)), shape=(n, n))
+    return int(connected_components(graph, directed=False)[0])
+
+
+# Returns every order metric of a flock given as (n, 2) position and velocity arrays
+def flock_metrics(pos, vel, radius):
+    return {
+        'polarization': polarization(vel),
+        'nearest_distance': mean_nearest_distance(pos),
+        'clusters': cluster_count(pos, radius),
+    }
@@ -0,0 +1,138 @@
+import json
+import math
+import numpy as np
+import pygame as pg
+
+
+# Static circles and polygons boids steer around. Loaded from a JSON file of the form
+# {"circles": [[x, y, radius], ...], "polygons": [[[x, y], [x, y], ...], ...]}
+class Obstacles:
+    COLOR = (60, 60, 70)
+
+    def __init__(self, circles=(), polygons=()):
+        self.circles = [tuple(circle) for circle in circles]
+        self.polygons = [[tuple(point) for point in polygon] for polygon in polygons]
+
+    @classmethod
+    def load(cls, path):
+        with open(path) as file:
+            data = json.load(file)
+
+        return cls(data.get('circles', ()), data.get('polygons', ()))
+
+    # Returns the signed distance from every point to the closest obstacle surface, negative inside an obstacle,
+    # and the unit vector pointing away from that obstacle
+    def get_distances(self, xs, ys):
+        distances = np.full(xs.shape, np.inf)
+        away_x = np.zeros(xs.shape)
+        away_y = np.zeros(xs.shape)
+
+        for x, y, radius in self.circles:
+            dx, dy = xs - x, ys - y
+            center_dist = np.hypot(dx, dy)
+            dist = center_dist - radius
+            closer = dist < distances
+            safe = np.where(center_dist == 0, 1, center_dist)
+            distances[closer] = dist[closer]
+            away_x[closer] = (dx / safe)[closer]
+            away_y[closer] = (dy / safe)[closer]
+
+        for polygon in self.polygons:
+            dist, dx, dy = self._get_polygon_distances(polygon, xs, ys)
+            closer = dist < distances
+            length = np.where(dist == 0, 1, np.abs(dist))
+            distances[closer] = dist[closer]
+            # Inside, the closest edge point is the way out; outside, away from it
+            sign = np.where(dist < 0, -1, 1)
+            away_x[closer] = (sign * dx / length)[closer]
+            away_y[closer] = (sign * dy / length)[closer]
+
+        return distances, away_x, away_y
+
+    # Returns the signed distance to the polygon and the offset from its closest edge point to every point
+    @staticmethod
+    def _get_polygon_distances(polygon, xs, ys):
+        distances = np.full(xs.shape, np.inf)
+        offset_x = np.zeros(xs.shape)
+        offset_y = np.zeros(xs.shape)
+        inside = np.zeros(xs.shape, dtype=bool)
+
+        for (ax, ay), (bx, by) in zip(polygon, polygon[1:] + polygon[:1]):
+            edge_x, edge_y = bx - ax, by - ay
+            length_sq = edge_x ** 2 + edge_y ** 2 or 1
+            t = np.clip(((xs - ax) * edge_x + (ys - ay) * edge_y) / length_sq, 0, 1)
+            dx = xs - (ax + t * edge_x)
+            dy = ys - (ay + t * edge_y)
+            dist = np.hypot(dx, dy)
+
+            closer = dist < distances
+            distances[closer] = dist[closer]
+            offset_x[closer] = dx[closer]
+            offset_y[closer] = dy[closer]
+
+            # Even-odd rule: count the edges a ray going right from the point crosses
+            if ay != by:
+                crosses = (ay > ys) != (by > ys)
+                inside ^= crosses & (xs < ax + (ys - ay) * edge_x / edge_y)
+
+        return np.where(inside, -distances, distances), offset_x, offset_y
+
+    def draw(self, screen, offset=(0, 0), scale=1):
+        for x, y, radius in self.circles:
+            center = ((x - offset[0]) * scale, (y - offset[1]) * scale)
+            pg.draw.circle(screen, self.COLOR, center, radius * scale)
+
+        for polygon in self.polygons:
+            pg.draw.polygon(screen, self.COLOR, [((x - offset[0]) * scale, (y - offset[1]) * scale)
+                                                 for x, y in polygon])
+
+
+# Repulsion from the world borders and the obstacles, baked once into a grid of acceleration vectors so
+# every boid gets its avoidance force from a single lookup however many obstacles there are
+class RepulsionField:
+    RESOLUTION = 2  # Smallest cell size in pixels
+    MAX_SAMPLES = 4_000_000  # Cells get bigger for huge worlds to keep the grid under this many cells
+
+    def __init__(self, width, height, rules, obstacles=None, borders=True):
+        self.cell_size = max(self.RESOLUTION, math.sqrt(width * height / self.MAX_SAMPLES))
+        self.columns = max(1, math.ceil(width / self.cell_size))
+        self.rows = max(1, math.ceil(height / self.cell_size))
+
+        # Sample at the cell centers
+        xs = (np.arange(self.columns) + 0.5) * self.cell_size
+        ys = (np.arange(self.rows) + 0.5) * self.cell_size
+        xs, ys = np.meshgrid(xs, ys)
+        threshold = rules.BORDER_TRESHOLD
+        repulsion = rules.BORDER_REPULSION
+
+        # Same rules as the per-boid border checks they replace. Accelerations point up for positive y
+        force_x = np.zeros(xs.shape)
+        force_y = np.zeros(xs.shape)
+        if borders:
+            near_right = width - xs < threshold
+            near_left = ~near_right & (xs < threshold)
+            near_bottom = height - ys < threshold
+            near_top = ~near_bottom & (ys < threshold)
+            force_x += repulsion * (near_left.astype(np.float64) - near_right)
+            force_y += repulsion * (near_bottom.astype(np.float64) - near_top)
+
+        if obstacles is not None:
+            distances, away_x, away_y = obstacles.get_distances(xs, ys)
+            near = distances < threshold
+            force_x += np.where(near, repulsion * away_x, 0)
+            force_y -= np.where(near, repulsion * away_y, 0)
+
+        self.forces = np.stack((force_x, force_y), axis=-1).astype(np.float32)
+
+    # Returns the repulsion acceleration at one point. Points outside the world get the force of the nearest edge
+    def get_force(self, x, y):
+        column = min(max(int(x // self.cell_size), 0), self.columns - 1)
+        row = min(max(int(y // self.cell_size), 0), self.rows - 1)
+        force_x, force_y = self.forces[row, column].tolist()
+        return force_x, force_y
+
+    # Returns the repulsion acceleration at every point of an (n, 2) position array
+    def sample(self, pos):
+        columns = np.clip((pos[:, 0] // self.cell_size).astype(np.int64), 0, self.columns - 1)
+        rows = np.clip((pos[:, 1] // self.cell_size).astype(np.int64), 0, self.rows - 1)
+        return self.forces[rows, columns].astype(np.float64)
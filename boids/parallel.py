@@ -0,0 +1,81 @@
+import os
+import multiprocessing as mp
+from multiprocessing import shared_memory
+from types import SimpleNamespace
+import numpy as np
+from flock import Flock, get_accelerations
+from spatial import neighbor_pairs
+
+# Flocking constants sent to the workers, which can't receive the Boid class itself without importing pygame
+RULE_NAMES = ('VIEW_RADIUS', 'SEPARATION', 'ALIGNMENT', 'COHESION',
+              'BORDER_REPULSION', 'BORDER_TRESHOLD', 'MAX_VELOCITY', 'START_VEL')
+
+# State of a worker process, set up once when the pool starts
+_worker = {}
+
+
+def _init_worker(shm_name, count, rules, field):
+    shm = shared_memory.SharedMemory(name=shm_name)
+    pos, vel, acc = np.ndarray((3, count, 2), np.float64, shm.buf)
+    _worker.update(shm=shm, pos=pos, vel=vel, acc=acc, rules=SimpleNamespace(**rules), field=field)
+
+
+# Computes the accelerations of the boids in the strip lo <= x < hi and writes them to the shared buffer.
+# Boids within the view radius of the strip (the halo) are included as neighbors but not written back
+def _compute_shard(bounds):
+    lo, hi = bounds
+    pos, vel, rules = _worker['pos'], _worker['vel'], _worker['rules']
+    radius = rules.VIEW_RADIUS
+
+    x = pos[:, 0]
+    local = np.flatnonzero((x >= lo - radius) & (x < hi + radius))
+    local_pos = pos[local]
+    acc = get_accelerations(local_pos, vel[local], neighbor_pairs(local_pos, radius), rules, _worker['field'])
+
+    owned = (local_pos[:, 0] >= lo) & (local_pos[:, 0] < hi)
+    _worker['acc'][local[owned]] = acc[owned]
+
+
+# Flock whose accelerations are computed by a pool of worker processes, each owning a vertical strip of the world.
+# Positions, velocities and accelerations live in one shared memory block, so nothing is pickled per step
+# except the strip bounds. Call close() when done to stop the workers and free the shared memory
+class ParallelFlock(Flock):
+    def __init__(self, count, width, height, rules, seed=None, processes=None, field=None):
+        super().__init__(count, width, height, rules, seed, field=field)
+        self.processes = processes or os.cpu_count()
+
+        self.shm = shared_memory.SharedMemory(create=True, size=max(1, 3 * count * 2 * 8))
+        buffers = np.ndarray((3, count, 2), np.float64, self.shm.buf)
+        buffers[0] = self.pos
+        buffers[1] = self.vel
+        self.pos, self.vel, self.acc = buffers
+
+        rules = {name: getattr(rules, name) for name in RULE_NAMES}
+        # The repulsion field is pickled once per worker here, not per step
+        self.pool = mp.Pool(self.processes, _init_worker, (self.shm.name, count, rules, self.field))
+
+    # Splits the world into vertical strips holding about the same number of boids
+    def get_shard_bounds(self):
+        cuts = np.quantile(self.pos[:, 0], np.linspace(0, 1, self.processes + 1)[1:-1]) if len(self) else []
+        edges = [-np.inf, *cuts, np.inf]
+        return list(zip(edges[:-1], edges[1:]))
+
+    # Returns the acceleration of every boid. The workers find the neighbors themselves, so neighbors is ignored
+    def get_accelerations(self, neighbors=None):
+        self.pool.map(_compute_shard, self.get_shard_bounds())
+        return self.acc
+
+    def close(self):
+        if self.pool is None:
+            return
+
+        self.pool.terminate()
+        self.pool.join()
+        self.pool = None
+
+        # Keep the state readable after the shared memory is gone
+        self.pos = self.pos.copy()
+        self.vel = self.vel.copy()
+        self.acc = self.acc.copy()
+        self.shm.close()
+        self.shm.unlink()
@@ -0,0 +1,47 @@
+import queue
+import threading
+
+
+# Runs simulation steps on a worker thread, so the next frame is simulated while the current one is rendered.
+# Requests and results go through queues holding one item each, which keeps the worker one frame ahead at most.
+# Overlap comes from the engines spending most of a step in NumPy or worker processes, which release the GIL
+class SimulationPipeline:
+    def __init__(self, sim, step):
+        self.sim = sim
+        self.step = step
+        self.requests = queue.Queue(maxsize=1)
+        self.results = queue.Queue(maxsize=1)
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def _run(self):
+        while True:
+            steps = self.requests.get()
+            if steps is None:
+                return
+
+            try:
+                previous = None
+                for _ in range(steps):
+                    previous = self.sim.get_state()
+                    self.step()
+                self.results.put((previous, self.sim.get_state(), None))
+            except Exception as e:
+                self.results.put((None, None, e))
+
+    # Starts running the given number of steps in the background. The simulation must not be touched
+    # until get() returns
+    def submit(self, steps):
+        self.requests.put(steps)
+
+    # Waits for the submitted steps and returns the state before the last step (None if no step ran) and after it
+    def get(self):
+        previous, current, error = self.results.get()
+        if error is not None:
+            raise error
+
+        return previous, current
+
+    def close(self):
+        self.requests.put(None)
+        self.thread.join()
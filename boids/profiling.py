@@ -0,0 +1,86 @@
+import csv
+import json
+import time
+from collections import deque
+import numpy as np
+import pygame as pg
+
+
+# Turns the running totals of a PhaseTimer into per-frame times, keeps a rolling window of them for an
+# on-screen overlay and optionally appends every frame to a CSV or JSON lines log
+class FrameProfiler:
+    PERCENTILES = (50, 95, 99)
+    COLOR = (230, 230, 230)
+    BG_COLOR = (0, 0, 0, 170)
+
+    def __init__(self, timer, phases, history=300, log_path=None):
+        self.timer = timer
+        self.phases = phases
+        self.columns = ('frame', *phases)
+        self.history = {name: deque(maxlen=history) for name in self.columns}
+        self.visible = False
+        self.font = None
+        self.frame_count = 0
+        self.last_totals = dict(timer.totals)
+        self.last_frame = time.perf_counter()
+
+        self.log_file = None
+        self.log_writer = None
+        if log_path is not None:
+            self.log_file = open(log_path, 'w', newline='')
+            if log_path.endswith('.csv'):
+                self.log_writer = csv.writer(self.log_file)
+                self.log_writer.writerow(('index', *(f'{name}_ms' for name in self.columns)))
+
+    # Records the time spent in every phase since the previous call
+    def end_frame(self):
+        now = time.perf_counter()
+        totals = self.timer.totals
+        frame = {'frame': now - self.last_frame}
+        for name in self.phases:
+            frame[name] = totals.get(name, 0.0) - self.last_totals.get(name, 0.0)
+
+        self.last_totals = dict(totals)
+        self.last_frame = now
+
+        for name, seconds in frame.items():
+            self.history[name].append(seconds * 1000)
+
+        if self.log_file is not None:
+            self._log(frame)
+        self.frame_count += 1
+
+    def _log(self, frame):
+        if self.log_writer is not None:
+            self.log_writer.writerow((self.frame_count, *(f'{frame[name] * 1000:.4f}' for name in self.columns)))
+        else:
+            row = {f'{name}_ms': round(seconds * 1000, 4) for name, seconds in frame.items()}
+            self.log_file.write(json.dumps({'index': self.frame_count, **row}) + '\n')
+
+    # Returns the rolling percentiles in milliseconds of every phase that has been recorded
+    def get_percentiles(self):
+        return {name: np.percentile(values, self.PERCENTILES) for name, values in self.history.items() if values}
+
+    def draw(self, screen):
+        if not self.visible:
+            return
+
+        if self.font is None:
+            self.font = pg.font.Font(None, 20)
+
+        lines = ['phase        ' + '  '.join(f'p{p:<5}' for p in self.PERCENTILES)]
+        for name, values in self.get_percentiles().items():
+            lines.append(f'{name:<12} ' + '  '.join(f'{value:6.2f}' for value in values))
+
+        surfs = [self.font.render(line, True, self.COLOR) for line in lines]
+        panel = pg.Surface((max(surf.width for surf in surfs) + 16, len(surfs) * 18 + 12), pg.SRCALPHA)
+        panel.fill(self.BG_COLOR)
+        for i, surf in enumerate(surfs):
+            panel.blit(surf, (8, 6 + i * 18))
+
+        screen.blit(panel, (8, 8))
+
+    def close(self):
+        if self.log_file is not None:
+            self.log_file.close()
+            self.log_file = None
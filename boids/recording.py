@@ -0,0 +1,72 @@
+import struct
+import numpy as np
+
+# File layout: a fixed-size header followed by one frame per step. A frame is FIELDS float32 values per boid
+MAGIC = b'BOID'
+VERSION = 1
+FIELDS = ('x', 'y', 'velx', 'vely', 'angle')
+# magic, version, field count, boid count, delta time, seed (-1 if none), world width and height, toroidal
+HEADER = struct.Struct('<4sHHIdqdd?3x')
+
+
+# Appends every step of a simulation to a trajectory file
+class TrajectoryRecorder:
+    def __init__(self, path, count, delta_time, seed, width, height, toroidal=False):
+        self.count = count
+        self.file = open(path, 'wb')
+        self.file.write(HEADER.pack(MAGIC, VERSION, len(FIELDS), count, delta_time, -1 if seed is None else seed,
+                                    width, height, toroidal))
+        self.frame = np.empty((count, len(FIELDS)), dtype=np.float32)
+
+    # Appends the current state of sim, anything with get_state and get_velocities like Simulation
+    def write(self, sim):
+        xs, ys, angles = sim.get_state()
+        velxs, velys = sim.get_velocities()
+        for i, column in enumerate((xs, ys, velxs, velys, angles)):
+            self.frame[:, i] = column
+
+        self.file.write(self.frame.tobytes())
+
+    def close(self):
+        self.file.close()
+
+
+# Read-only view of a trajectory file. Frames are memory-mapped, so only the pages of the frames actually
+# read are loaded and files much bigger than memory can be streamed
+class Trajectory:
+    def __init__(self, path):
+        with open(path, 'rb') as file:
+            header = file.read(HEADER.size)
+            file.seek(0, 2)
+            size = file.tell()
+
+        if len(header) < HEADER.size:
+            raise ValueError(f'{path} is too short to be a trajectory file')
+
+        magic, version, fields, self.count, self.delta_time, seed, self.width, self.height, self.toroidal = \
+            HEADER.unpack(header)
+        if magic != MAGIC or version != VERSION or fields != len(FIELDS):
+            raise ValueError(f'{path} is not a version {VERSION} trajectory file')
+
+        self.seed = None if seed == -1 else seed
+        frame_size = self.count * len(FIELDS) * 4
+        # Ignore a partly written last frame, so recordings of interrupted runs stay readable
+        self.frame_count = (size - HEADER.size) // frame_size if frame_size else 0
+
+        self.frames = None
+        if self.frame_count:
+            self.frames = np.memmap(path, np.float32, 'r', HEADER.size, (self.frame_count, self.count, len(FIELDS)))
+
+    def __len__(self):
+        return self.frame_count
+
+    # Returns frame i as a (count, len(FIELDS)) array backed by the file
+    def __getitem__(self, i):
+        if not -self.frame_count <= i < self.frame_count:
+            raise IndexError(f'Frame {i} out of range for {self.frame_count} frames')
+
+        return self.frames[i]
+
+    # Drops the memory map, which is unmapped once no frame returned from it is still referenced
+    def close(self):
+        self.frames = None
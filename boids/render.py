@@ -0,0 +1,90 @@
+import numpy as np
+import pygame as pg
+
+
+# A sprite pre-rotated at evenly spaced angles, so drawing it at any angle is a lookup instead of a rotation
+class SpriteAtlas:
+    def __init__(self, surf, steps=360):
+        self.steps = steps
+        self.surfaces = []
+        # Half the size of every rotated surface, to turn a center position into a top-left one
+        self.offsets = np.empty((steps, 2))
+
+        for i in range(steps):
+            rotated = pg.transform.rotate(surf, i * 360 / steps)
+            if pg.display.get_surface() is not None:
+                rotated = rotated.convert()
+
+            self.surfaces.append(rotated)
+            self.offsets[i] = rotated.width / 2, rotated.height / 2
+
+    # Returns the blit sequence drawing the sprite centered on each position at each angle
+    def get_blits(self, xs, ys, angles):
+        indices = np.rint(np.asarray(angles) * (self.steps / 360)).astype(np.int64) % self.steps
+        lefts = (np.asarray(xs) - self.offsets[indices, 0]).tolist()
+        tops = (np.asarray(ys) - self.offsets[indices, 1]).tolist()
+        surfaces = self.surfaces
+        return [(surfaces[i], (left, top)) for i, left, top in zip(indices.tolist(), lefts, tops)]
+
+
+# Plots one pixel per point, for views zoomed out so far that sprites would only be noise
+def plot_points(screen, xs, ys, color):
+    xs = np.asarray(xs).astype(np.int64)
+    ys = np.asarray(ys).astype(np.int64)
+    inside = (xs >= 0) & (xs < screen.width) & (ys >= 0) & (ys < screen.height)
+
+    pixels = pg.surfarray.pixels2d(screen)
+    pixels[xs[inside], ys[inside]] = screen.map_rgb(color)
+    del pixels  # Unlocks the screen
+
+
+# Pannable, zoomable view into a world that can be bigger than the screen. x and y are the world
+# coordinates of the screen's top-left corner and zoom is the number of screen pixels per world pixel
+class Camera:
+    MIN_ZOOM = 0.01
+    MAX_ZOOM = 8
+
+    def __init__(self, screen_size, world_size, toroidal=False):
+        self.screen_width, self.screen_height = screen_size
+        self.world_width, self.world_height = world_size
+        self.toroidal = toroidal
+        self.fit()
+
+    # Zooms out to show the whole world, centered
+    def fit(self):
+        self.zoom = min(1.0, self.screen_width / self.world_width, self.screen_height / self.world_height)
+        self.x = (self.world_width - self.screen_width / self.zoom) / 2
+        self.y = (self.world_height - self.screen_height / self.zoom) / 2
+
+    # Moves the view by a distance in screen pixels
+    def pan(self, dx, dy):
+        self.x -= dx / self.zoom
+        self.y -= dy / self.zoom
+        if self.toroidal:
+            self.x %= self.world_width
+            self.y %= self.world_height
+
+    # Zooms by a factor while keeping the world point under the screen position in place
+    def zoom_at(self, factor, screen_x, screen_y):
+        world_x = self.x + screen_x / self.zoom
+        world_y = self.y + screen_y / self.zoom
+        self.zoom = min(max(self.zoom * factor, self.MIN_ZOOM), self.MAX_ZOOM)
+        self.x = world_x - screen_x / self.zoom
+        self.y = world_y - screen_y / self.zoom
+
+    def world_to_screen(self, x, y):
+        return (x - self.x) * self.zoom, (y - self.y) * self.zoom
+
+    # Returns the indices of the points within margin screen pixels of the view and their screen positions.
+    # In a toroidal world, points are seen at their nearest copy to the view
+    def cull(self, xs, ys, margin=0):
+        world_margin = margin / self.zoom
+        rel_x = xs - self.x
+        rel_y = ys - self.y
+        if self.toroidal:
+            rel_x = (rel_x + world_margin) % self.world_width - world_margin
+            rel_y = (rel_y + world_margin) % self.world_height - world_margin
+
+        visible = np.flatnonzero((rel_x > -world_margin) & (rel_x < self.screen_width / self.zoom + world_margin)
+                                 & (rel_y > -world_margin) & (rel_y < self.screen_height / self.zoom + world_margin))
+        return visible, rel_x[visible] * self.zoom, rel_y[visible] * self.zoom
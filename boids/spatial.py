@@ -0,0 +1,123 @@
+from collections import defaultdict
+import numpy as np
+
+
+# Uniform grid that buckets objects with x/y attributes into square cells, so that everything within
+# cell_size of a point can be found by only looking at the 3x3 block of cells around it
+class SpatialGrid:
+    def __init__(self, cell_size):
+        self.cell_size = cell_size
+        self.cells = defaultdict(list)
+
+    # Returns the (column, row) key of the cell containing the point
+    def cell_of(self, x, y):
+        return int(x // self.cell_size), int(y // self.cell_size)
+
+    # Clears the grid and inserts every item at its current position
+    def rebuild(self, items):
+        self.cells.clear()
+        for item in items:
+            self.cells[self.cell_of(item.x, item.y)].append(item)
+
+    # Yields every item in the cells around the point, a superset of the items within cell_size of it
+    def nearby(self, x, y):
+        cell_x, cell_y = self.cell_of(x, y)
+
+        for i in range(cell_x - 1, cell_x + 2):
+            for j in range(cell_y - 1, cell_y + 2):
+                cell = self.cells.get((i, j))
+                if cell:
+                    yield from cell
+
+
+# Vectorized counterpart of SpatialGrid for positions stored in an (n, 2) array.
+# Returns the index arrays i, j and the distances of every ordered pair of distinct points within radius.
+# With wrap set to the (width, height) of a toroidal world, pairs and distances also reach across its edges
+def neighbor_pairs(pos, radius, wrap=None):
+    n = len(pos)
+    if n == 0:
+        empty = np.empty(0, dtype=np.int64)
+        return empty, empty, np.empty(0)
+
+    if wrap is None:
+        # Pad the grid by one cell on each side so neighbor offsets never wrap around
+        cells = np.floor(pos / radius).astype(np.int64)
+        cells -= cells.min(axis=0) - 1
+        columns = cells[:, 0].max() + 2
+    else:
+        # Fit a whole number of cells at least radius wide into the world, so the grid wraps with it
+        columns, rows = int(wrap[0] // radius), int(wrap[1] // radius)
+        if columns < 3 or rows < 3:
+            raise ValueError('A toroidal world must be at least 3 view radii wide and high')
+        cells = np.floor(pos / (wrap[0] / columns, wrap[1] / rows)).astype(np.int64) % (columns, rows)
+
+    # Query in cell order, so the searched keys are (mostly) sorted too and the lookups stay cache friendly
+    keys = cells[:, 1] * columns + cells[:, 0]
+    order = np.argsort(keys, kind='stable')
+    sorted_keys = keys[order]
+    sorted_cells = cells[order]
+    pairs_i = []
+    pairs_j = []
+
+    for offset_y in (-1, 0, 1):
+        for offset_x in (-1, 0, 1):
+            if wrap is None:
+                target = sorted_keys + offset_y * columns + offset_x
+            else:
+                target = ((sorted_cells[:, 1] + offset_y) % rows * columns
+                          + (sorted_cells[:, 0] + offset_x) % columns)
+            start = np.searchsorted(sorted_keys, target, 'left')
+            counts = np.searchsorted(sorted_keys, target, 'right') - start
+
+            # Expand each point into one candidate pair per point in the target cell
+            total = counts.sum()
+            first = np.repeat(np.cumsum(counts) - counts, counts)
+            pairs_i.append(np.repeat(order, counts))
+            pairs_j.append(order[np.repeat(start, counts) + np.arange(total) - first])
+
+    i = np.concatenate(pairs_i)
+    j = np.concatenate(pairs_j)
+    dx, dy = get_offsets(pos, i, j, wrap)
+    dist = np.hypot(dx, dy)
+    mask = (dist <= radius) & (i != j)
+
+    return i[mask], j[mask], dist[mask]
+
+
+# Returns the x and y offsets from points i to points j, the shortest way around a toroidal world if wrap is set
+def get_offsets(pos, i, j, wrap=None):
+    dx = pos[j, 0] - pos[i, 0]
+    dy = pos[j, 1] - pos[i, 1]
+
+    if wrap is not None:
+        dx -= wrap[0] * np.round(dx / wrap[0])
+        dy -= wrap[1] * np.round(dy / wrap[1])
+
+    return dx, dy
+
+
+# Returns the indices and distances of the k nearest other points of every point as (n, k) arrays,
+# from a KD-tree rebuilt over all points and queried for all of them in one batch. See neighbor_pairs for wrap
+def knn_neighbors(pos, k, wrap=None):
+    n = len(pos)
+    k = min(k, n - 1)
+    if k <= 0:
+        return np.empty((n, 0), dtype=np.int64), np.empty((n, 0))
+
+    # SciPy is only needed for this neighbor mode, so it isn't imported before it's used
+    from scipy.spatial import cKDTree
+
+    # Ask for one extra neighbor, since every point finds itself too
+    dist, idx = cKDTree(pos, boxsize=wrap).query(pos, list(range(1, k + 2)), workers=-1)
+
+    # A point is usually its own first match, but coincident points can come back in either order
+    not_self = idx != np.arange(n)[:, None]
+    not_self[not_self.all(axis=1), -1] = False
+
+    return idx[not_self].reshape(n, k), dist[not_self].reshape(n, k)
+
+
+# Same as knn_neighbors, but flattened into the i, j, dist pairs returned by neighbor_pairs
+def knn_pairs(pos, k, wrap=None):
+    idx, dist = knn_neighbors(pos, k, wrap)
+    return np.repeat(np.arange(len(pos)), idx.shape[1]), idx.ravel(), dist.ravel()
@@ -0,0 +1,89 @@
+import argparse
+import csv
+import itertools
+import multiprocessing as mp
+import os
+import numpy as np
+from boids import Boid, Simulation
+from headless import scaled_world_size, DELTA_TIME
+from metrics import flock_metrics
+
+TUNABLE = ('SEPARATION', 'ALIGNMENT', 'COHESION', 'VIEW_RADIUS', 'MAX_VELOCITY')
+METRICS = ('polarization', 'nearest_distance', 'clusters')
+
+
+# Returns every combination of the given values, e.g. {'COHESION': [1, 2]}, as a list of {name: value} dicts
+def parameter_grid(values):
+    names = list(values)
+    return [dict(zip(names, combination)) for combination in itertools.product(*values.values())]
+
+
+# Runs one configuration without a window and returns a table row of metrics for every sampled step
+def run_config(task):
+    index, params, seed, count, steps, every, engine, neighbor_mode = task
+    rules = type('SweepBoid', (Boid,), params)
+    width, height = scaled_world_size(count)
+    sim = Simulation(count, width, height, engine, seed, neighbor_mode, rules)
+
+    rows = []
+    for step in range(1, steps + 1):
+        sim.step(DELTA_TIME)
+
+        if step % every == 0 or step == steps:
+            pos = np.column_stack(sim.get_state()[:2])
+            vel = np.column_stack(sim.get_velocities())
+            rows.append({'config': index, **params, 'seed': seed, 'step': step,
+                         **flock_metrics(pos, vel, rules.VIEW_RADIUS)})
+
+    sim.close()
+    return rows
+
+
+# Runs every configuration once per seed in a process pool and writes all metric rows to one CSV table
+def sweep(grid, out_path, seeds=1, count=200, steps=300, every=10, engine='numpy', neighbor_mode='radius',
+          processes=None):
+    tasks = [(index, params, seed, count, steps, every, engine, neighbor_mode)
+             for index, params in enumerate(grid) for seed in range(seeds)]
+    columns = ['config', *(grid[0] if grid else ()), 'seed', 'step', *METRICS]
+    processes = processes or os.cpu_count()
+
+    with open(out_path, 'w', newline='') as file, mp.Pool(processes) as pool:
+        writer = csv.DictWriter(file, columns)
+        writer.writeheader()
+
+        chunksize = max(1, len(tasks) // (processes * 8))
+        for done, rows in enumerate(pool.imap_unordered(run_config, tasks, chunksize), 1):
+            writer.writerows(rows)
+            if done % 100 == 0 or done == len(tasks):
+                print(f'{done}/{len(tasks)} runs done', flush=True)
+
+
+def parse_param(text):
+    name, _, values = text.partition('=')
+    if name not in TUNABLE:
+        raise argparse.ArgumentTypeError(f'{name} is not one of {", ".join(TUNABLE)}')
+
+    return name, [float(value) if '.' in value else int(value) for value in values.split(',')]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Run headless boids simulations over a grid of parameters')
+    parser.add_argument('--param', type=parse_param, action='append', default=[], metavar='NAME=V1,V2,...',
+                        help=f'values to try for one of {", ".join(TUNABLE)}, can be repeated')
+    parser.add_argument('--seeds', type=int, default=1, help='runs per configuration, with seeds 0 to N-1')
+    parser.add_argument('--count', type=int, default=200)
+    parser.add_argument('--steps', type=int, default=300)
+    parser.add_argument('--every', type=int, default=10, help='compute the metrics every N steps')
+    parser.add_argument('--engine', choices=('object', 'numpy'), default='numpy')
+    parser.add_argument('--neighbors', choices=Simulation.NEIGHBOR_MODES, default='radius')
+    parser.add_argument('--processes', type=int, help='worker processes, one per core by default')
+    parser.add_argument('--out', default='sweep.csv')
+    args = parser.parse_args()
+
+    grid = parameter_grid(dict(args.param))
+    sweep(grid, args.out, args.seeds, args.count, args.steps, args.every, args.engine, args.neighbors,
+          args.processes)
+
+
+if __name__ == '__main__':
+    main()
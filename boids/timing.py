@@ -0,0 +1,36 @@
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+
+
+# Accumulates wall-clock time spent in named phases of the simulation
+class PhaseTimer:
+    def __init__(self):
+        self.totals = defaultdict(float)
+
+    @contextmanager
+    def phase(self, name):
+        start = time.perf_counter()
+        yield
+        self.totals[name] += time.perf_counter() - start
+
+
+# Turns variable frame times into a whole number of fixed-length simulation steps
+class FixedTimestep:
+    def __init__(self, rate, max_steps=5):
+        self.interval = 1 / rate
+        self.max_steps = max_steps
+        self.accumulator = 0.0
+
+    # Adds the elapsed real time in seconds and returns how many steps to run to catch up.
+    # Time that would need more than max_steps is dropped, so the simulation slows down instead of spiraling
+    def advance(self, elapsed):
+        self.accumulator += elapsed
+        steps = min(int(self.accumulator // self.interval), self.max_steps)
+        self.accumulator = min(self.accumulator - steps * self.interval, self.interval)
+        return steps
+
+    # How far the real time is between the last step and the next one, from 0 to 1
+    @property
+    def alpha(self):
+        return min(1.0, self.accumulator / self.interval)
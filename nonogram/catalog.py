@@ -0,0 +1,187 @@
+import argparse
+import hashlib
+import json
+import multiprocessing as mp
+import os
+import time
+from rating import rate_puzzle
+from puzzles import LIBRARY, EXTENSION, PACK_EXTENSION, PuzzlePack, read_header, decode_guides, encode_puzzle, \
+    import_json
+
+# The index is kept in the library directory. Each file of the library is listed with the modification time and size
+# it had when it was read and the entries of the puzzles in it, so only new and changed files are read and rated
+# on a refresh. The version changes whenever the entries do, which makes the next refresh rate everything again
+CATALOG_NAME = '.catalog.json'
+CATALOG_VERSION = 3
+
+
+# Returns the catalog entry of a puzzle record: its size, fill density, a hash of its guides and its rating.
+# Without rate, the entry has no rating and is made without running the solver
+def describe_record(name, record, rate=True):
+    rows, cols = read_header(record)
+    row_guides, col_guides = decode_guides(record)
+
+    return {
+        'name': name,
+        'rows': rows,
+        'cols': cols,
+        'density': round(sum(map(sum, row_guides)) / (rows * cols), 3),
+        'clue_hash': hashlib.sha1(repr((row_guides, col_guides)).encode()).hexdigest()[:16],
+        **(rate_puzzle(row_guides, col_guides) if rate else {}),
+    }
+
+
+# Returns the file name and the entry of a (file name, puzzle name, record) task, None for a broken record.
+# Runs in the worker processes of Catalog.refresh
+def describe_task(task):
+    file_name, name, record = task
+    try:
+        return file_name, describe_record(name, record)
+    except ValueError:
+        return file_name, None
+
+
+# Yields the results of describe_task for the tasks, in order, made in a pool of processes workers
+# (one per core if it's None) or in this process if it's 1
+def describe_tasks(tasks, processes=1):
+    if processes == 1 or len(tasks) < 2:
+        yield from map(describe_task, tasks)
+        return
+
+    processes = processes or os.cpu_count()
+    with mp.Pool(processes) as pool:
+        yield from pool.imap(describe_task, tasks, max(1, len(tasks) // (processes * 8)))
+
+
+# Returns the (name, record) pairs of the puzzles in a file of the library
+def read_library_file(directory, file_name):
+    path = os.path.join(directory, file_name)
+    stem, extension = os.path.splitext(file_name)
+
+    if extension == PACK_EXTENSION:
+        pack = PuzzlePack(path)
+        records = [(f'{stem}/{name}', bytes(pack.get_record(name))) for name in pack.get_names()]
+        pack.close()
+        return records
+    if extension == EXTENSION:
+        with open(path, 'rb') as file:
+            return [(stem, file.read())]
+
+    return [(stem, encode_puzzle(import_json(path)))]
+
+
+class Catalog:
+    def __init__(self, directory=LIBRARY):
+        self.directory = directory
+        self.path = os.path.join(directory, CATALOG_NAME)
+        self.files = {}
+        self.entries = []
+
+        try:
+            with open(self.path) as file:
+                index = json.load(file)
+            if index.get('version') == CATALOG_VERSION:
+                self.files = index['files']
+        except (OSError, ValueError):
+            pass
+
+        self._update_entries()
+
+    # Lists the files of the library by name with their stat results. JSON files are left out when there's a binary
+    # file of the same name, as the binary file is the one that gets loaded
+    def _scan(self):
+        files = {}
+        with os.scandir(self.directory) as it:
+            for entry in it:
+                if entry.is_file() and entry.name.endswith((EXTENSION, PACK_EXTENSION, '.json')) \
+                        and entry.name != CATALOG_NAME:
+                    files[entry.name] = entry.stat()
+
+        for file_name in list(files):
+            stem, extension = os.path.splitext(file_name)
+            if extension == '.json' and stem + EXTENSION in files:
+                del files[file_name]
+
+        return files
+
+    # Lists the entries of the files, and of the unrated puzzles being rated, sorted by name
+    def _update_entries(self, unrated=()):
+        entries = [entry for info in self.files.values() for entry in info['puzzles']] + list(unrated)
+        self.entries = sorted(entries, key=lambda entry: entry['name'])
+
+    # Rereads and rates the puzzles of the files that were added or changed since the last refresh and drops the
+    # removed files. With force, every file is read again. Returns the number of files read.
+    # The puzzles read are listed in entries without a rating before they're rated, and entries is replaced rather
+    # than changed, so another thread can show it while the refresh runs
+    def refresh(self, processes=1, force=False):
+        scanned = self._scan()
+        changed = [file_name for file_name, stat in scanned.items()
+                   if force or file_name not in self.files
+                   or self.files[file_name]['mtime'] != stat.st_mtime_ns
+                   or self.files[file_name]['size'] != stat.st_size]
+        removed = [file_name for file_name in self.files if file_name not in scanned]
+
+        for file_name in removed:
+            del self.files[file_name]
+
+        tasks = []
+        for file_name in changed:
+            try:
+                tasks += [(file_name, name, record) for name, record in read_library_file(self.directory, file_name)]
+            except (OSError, ValueError):
+                pass  # Unreadable files are listed without puzzles and skipped until they change again
+
+            stat = scanned[file_name]
+            self.files[file_name] = {'mtime': stat.st_mtime_ns, 'size': stat.st_size, 'puzzles': []}
+
+        unrated = []
+        for file_name, name, record in tasks:
+            try:
+                unrated.append(describe_record(name, record, rate=False))
+            except ValueError:
+                pass
+        if changed or removed:
+            self._update_entries(unrated)
+
+        for file_name, entry in describe_tasks(tasks, processes):
+            if entry is not None:
+                self.files[file_name]['puzzles'].append(entry)
+
+        if changed or removed:
+            self._update_entries()
+            self.save()
+
+        return len(changed)
+
+    # Writes the index to a temporary file first so an interrupted save doesn't leave a broken index behind
+    def save(self):
+        temp_path = self.path + '.tmp'
+        with open(temp_path, 'w') as file:
+            json.dump({'version': CATALOG_VERSION, 'files': self.files}, file)
+        os.replace(temp_path, self.path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Update the catalog of the puzzle library, rating new and changed '
+                                                 'puzzles, and list its puzzles')
+    parser.add_argument('--library', default=LIBRARY, help='directory of the puzzle library')
+    parser.add_argument('--processes', type=int, help='worker processes rating the puzzles, one per core by default')
+    parser.add_argument('--force', action='store_true', help='read and rate every puzzle again')
+    parser.add_argument('--list', action='store_true', help='print the entries of all puzzles, easiest first')
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    catalog = Catalog(args.library)
+    read = catalog.refresh(args.processes, args.force)
+    print(f'{len(catalog.entries)} puzzles, {read} files read in {time.perf_counter() - start:.2f}s')
+
+    if args.list:
+        unrated = float('inf')
+        for entry in sorted(catalog.entries, key=lambda entry: entry['difficulty'] or unrated):
+            print(f'{entry["name"]:30} {entry["rows"]}x{entry["cols"]:<5} {entry["density"]:6.1%} '
+                  f'{entry["difficulty"] if entry["difficulty"] is not None else "?":>6} '
+                  f'{"unique" if entry["unique"] else "not unique":10}  {entry["clue_hash"]}')
+
+
+if __name__ == '__main__':
+    main()
@@ -1,65 +1,14 @@
 import pygame as pg
-from itertools import groupby
-import json
+import numpy as np
 from ui import InputBox, EventManager
+from grid import Grid, parse_size
+from puzzles import load_puzzle, save_puzzle
 
 
-class Grid:
-    def __init__(self, matrix):
-        self.matrix = matrix
-        self.row_guides = self._get_row_guides()
-        self.col_guides = self._get_col_guides()
-
-    # Returns a list of lists of numbers representing the consecutive black boxes in each row
-    def _get_row_guides(self):
-        guides = []
-
-        for i in range(len(self.matrix)):
-            nums = [len(list(group)) for key, group in groupby(self.get_row(i)) if key == 1]
-
-            if not nums:
-                guides.append([0])
-            else:
-                guides.append(nums)
-
-        return guides
-
-    # Returns a list of lists of numbers representing the consecutive black boxes in each column
-    def _get_col_guides(self):
-        guides = []
-
-        for i in range(len(self.matrix)):
-            nums = [len(list(group)) for key, group in groupby(self.get_col(i)) if key == 1]
-
-            if not nums:
-                guides.append([0])
-            else:
-                guides.append(nums)
-
-        return guides
-
-    # Returns the i-th column
-    def get_col(self, i):
-        return list(map(lambda row: row[i], self.matrix))
-
-    # Returns the i-th row
-    def get_row(self, i):
-        return self.matrix[i]
-
-    # Get the state of a box
-    def get_box(self, row, col):
-        return self.matrix[row][col]
-
-    # Set the state of a box
-    def set_box(self, row, col, state):
-        self.matrix[row][col] = state
-        self.row_guides = self._get_row_guides()
-        self.col_guides = self._get_col_guides()
-
 def draw_grid():
     # Draw grid boxes
-    for i in range(GRID_SIZE):
-        for j in range(GRID_SIZE):
+    for i in range(grid.height):
+        for j in range(grid.width):
             box_rect = (grid_rect.x + j * BOX_LENGTH, grid_rect.y + i * BOX_LENGTH, BOX_LENGTH, BOX_LENGTH)
 
             if grid.get_box(i, j) == 0:
@@ -70,29 +19,31 @@ def draw_grid():
                 pg.draw.rect(screen, pg.Color('red'), box_rect)  # TODO: Placeholder
 
     # Draw grid lines
-    for i in range(GRID_SIZE - 1):
+    for i in range(grid.width - 1):
         # Vertical line
         pg.draw.line(screen, LINE_COL,
                      (grid_rect.x + (i + 1) * BOX_LENGTH, grid_rect.y),
-                     (grid_rect.x + (i + 1) * BOX_LENGTH, grid_rect.y + GRID_SIZE * BOX_LENGTH - 1))
+                     (grid_rect.x + (i + 1) * BOX_LENGTH, grid_rect.y + grid.height * BOX_LENGTH - 1))
+    for i in range(grid.height - 1):
         # Horizontal line
         pg.draw.line(screen, LINE_COL,
                      (grid_rect.x, grid_rect.y + (i + 1) * BOX_LENGTH),
-                     (grid_rect.x + GRID_SIZE * BOX_LENGTH - 1, grid_rect.y + (i + 1) * BOX_LENGTH))
+                     (grid_rect.x + grid.width * BOX_LENGTH - 1, grid_rect.y + (i + 1) * BOX_LENGTH))
 
-    for i in range(4, GRID_SIZE - 1, 5):
+    for i in range(4, grid.width - 1, 5):
         # Vertical thick line
         pg.draw.line(screen, THICK_LINE_COL,
                      (grid_rect.x + (i + 1) * BOX_LENGTH, grid_rect.y),
-                     (grid_rect.x + (i + 1) * BOX_LENGTH, grid_rect.y + GRID_SIZE * BOX_LENGTH - 1), 3)
+                     (grid_rect.x + (i + 1) * BOX_LENGTH, grid_rect.y + grid.height * BOX_LENGTH - 1), 3)
+    for i in range(4, grid.height - 1, 5):
         # Horizontal thick line
         pg.draw.line(screen, THICK_LINE_COL,
                      (grid_rect.x, grid_rect.y + (i + 1) * BOX_LENGTH),
-                     (grid_rect.x + GRID_SIZE * BOX_LENGTH - 1, grid_rect.y + (i + 1) * BOX_LENGTH), 3)
+                     (grid_rect.x + grid.width * BOX_LENGTH - 1, grid_rect.y + (i + 1) * BOX_LENGTH), 3)
 
     # Draw grid border
     pg.draw.rect(screen, GRID_BORDER_COL,
-                 (grid_rect.x, grid_rect.y, BOX_LENGTH * GRID_SIZE, BOX_LENGTH * GRID_SIZE), 3)
+                 (grid_rect.x, grid_rect.y, BOX_LENGTH * grid.width, BOX_LENGTH * grid.height), 3)
 
 def on_quit(e):
     global running
@@ -111,8 +62,8 @@ def on_key_down(e):
     if e.key == pg.K_r and len(sprites) == 0:
         kill_sprites_with_tag('inputbox')
         new_inputbox = InputBox(screen.get_rect().center,
-                                'Size of the new grid:',
-                                lambda: create_empty_grid(int(new_inputbox.text)),
+                                'Size of the new grid (15 or 10x20):',
+                                lambda: create_empty_grid(*parse_size(new_inputbox.text)),
                                 event_manager,
                                 'inputbox')
         sprites.add(new_inputbox)
@@ -145,7 +96,7 @@ def on_mouse_pressed():
         (1, 1): 0
     }
 
-    if 0 < col_clicked < GRID_SIZE and 0 < row_clicked < GRID_SIZE:  # if mouse on grid
+    if 0 < col_clicked < grid.width and 0 < row_clicked < grid.height:  # if mouse on grid
         row = int(row_clicked)
         col = int(col_clicked)
         box_state = grid.get_box(row, col)
@@ -158,29 +109,23 @@ def on_mouse_pressed():
         if (mb_pressed, box_state) in toggle_map and box_state == first_changed_state:
             grid.set_box(row, col, toggle_map[(mb_pressed, box_state)])
 
-def load_grid(name):
-    global BOX_LENGTH, GRID_SIZE, grid, grid_rect, grid_created
-
-    with open(f'grids/{name}.json') as file:
-        grid = Grid(json.load(file))
+# Shows a grid with the box length set so its longer side fits the screen
+def set_grid(new_grid):
+    global BOX_LENGTH, grid, grid_rect, grid_created
 
-    GRID_SIZE = len(grid.matrix)
-    BOX_LENGTH = int((screen.width - MARGIN_BOTTOMRIGHT - MARGIN_TOPLEFT) / GRID_SIZE)
-    grid_rect = pg.Rect(MARGIN_TOPLEFT, MARGIN_TOPLEFT, BOX_LENGTH * GRID_SIZE, BOX_LENGTH * GRID_SIZE)
+    grid = new_grid
+    BOX_LENGTH = int((screen.width - MARGIN_BOTTOMRIGHT - MARGIN_TOPLEFT) / max(grid.height, grid.width))
+    grid_rect = pg.Rect(MARGIN_TOPLEFT, MARGIN_TOPLEFT, BOX_LENGTH * grid.width, BOX_LENGTH * grid.height)
     grid_created = True
 
-def create_empty_grid(size):
-    global BOX_LENGTH, GRID_SIZE, grid, grid_rect, grid_created
-    GRID_SIZE = size
-    BOX_LENGTH = int((screen.width - MARGIN_BOTTOMRIGHT - MARGIN_TOPLEFT) / size)
+def load_grid(name):
+    set_grid(Grid(load_puzzle(name)))
 
-    grid = Grid([[0] * size for _ in range(size)])
-    grid_rect = pg.Rect(MARGIN_TOPLEFT, MARGIN_TOPLEFT, BOX_LENGTH * size, BOX_LENGTH * size)
-    grid_created = True
+def create_empty_grid(rows, cols):
+    set_grid(Grid(np.zeros((rows, cols))))
 
 def save_grid(name):
-    with open(f'grids/{name}.json', 'w') as file:
-        json.dump(grid.matrix, file)
+    save_puzzle(name, grid.matrix)
 
 def kill_sprites_with_tag(tag):
     for sprite in sprites:
@@ -217,8 +162,8 @@ event_manager.add_listener(pg.KEYDOWN, on_key_down)
 
 sprites = pg.sprite.Group()
 new_inputbox = InputBox(screen.get_rect().center,
-                        'Size of the new grid:',
-                        lambda: create_empty_grid(int(new_inputbox.text)),
+                        'Size of the new grid (15 or 10x20):',
+                        lambda: create_empty_grid(*parse_size(new_inputbox.text)),
                         event_manager,
                         'inputbox')
 sprites.add(new_inputbox)
@@ -0,0 +1,109 @@
+import argparse
+import multiprocessing as mp
+import os
+import random
+import time
+from solver import Solver, get_line_guides
+from puzzles import EXTENSION, encode_puzzle, write_pack
+
+DENSITY = 0.7
+MAX_GUESSES = 200  # Puzzles the solver needs more guesses for are too hard to check and are rerolled
+
+
+# Returns a size x size matrix with about density of its boxes filled
+def create_random_matrix(size, density=DENSITY, rng=random):
+    matrix = [[0] * size for _ in range(size)]
+    for box in rng.sample(range(size ** 2), int((size ** 2) * density)):
+        matrix[box // size][box % size] = 1
+
+    return matrix
+
+
+# Returns a random matrix whose guides have exactly one solution, or None if none was found in max_attempts.
+# An ambiguous matrix is repaired by flipping a box the two solutions found disagree on, which changes the guides
+# of its lines, and rerolled once max_repairs flips didn't make it unique
+def generate_grid(size, density=DENSITY, rng=random, max_attempts=100, max_repairs=None):
+    max_repairs = size if max_repairs is None else max_repairs
+
+    for _ in range(max_attempts):
+        matrix = create_random_matrix(size, density, rng)
+
+        for _ in range(max_repairs + 1):
+            solver = Solver([get_line_guides(row) for row in matrix],
+                            [get_line_guides(col) for col in zip(*matrix)], MAX_GUESSES)
+            solutions = solver.solve(max_solutions=2)
+            if solver.gave_up:
+                break
+            if len(solutions) == 1:
+                return matrix
+
+            first, second = solutions
+            ambiguous = [(i, j) for i in range(size) for j in range(size) if first[i][j] != second[i][j]]
+            row, col = rng.choice(ambiguous)
+            matrix[row][col] = 1 - matrix[row][col]
+
+    return None
+
+
+# Generates one puzzle, seeded so a batch can be reproduced, and returns its name and record.
+# Runs in the worker processes of generate_batch
+def generate_task(task):
+    size, density, seed, prefix = task
+    start = time.perf_counter()
+    matrix = generate_grid(size, density, random.Random(seed))
+    if matrix is None:
+        return None, None, time.perf_counter() - start
+
+    return f'{prefix}{size}x{size}_{seed}', encode_puzzle(matrix), time.perf_counter() - start
+
+
+# Yields the (name, record) pairs of count unique puzzles with seeds first_seed onwards made in a process pool
+def _generate_records(tasks, processes):
+    start = time.perf_counter()
+    failed = 0
+
+    with mp.Pool(processes) as pool:
+        chunksize = max(1, len(tasks) // (processes * 8))
+        for done, (name, record, elapsed) in enumerate(pool.imap_unordered(generate_task, tasks, chunksize), 1):
+            if name is None:
+                failed += 1
+            else:
+                yield name, record
+            if done % 100 == 0 or done == len(tasks):
+                rate = done / (time.perf_counter() - start) * 3600
+                print(f'{done}/{len(tasks)} puzzles done, {failed} failed, {rate:.0f} per hour', flush=True)
+
+
+# Generates count unique puzzles and saves them in out_dir as binary files, or all into one pack file if pack is set
+def generate_batch(count, size, density=DENSITY, out_dir='grids', prefix='random', first_seed=0, processes=None,
+                   pack=None):
+    tasks = [(size, density, seed, prefix) for seed in range(first_seed, first_seed + count)]
+    records = _generate_records(tasks, processes or os.cpu_count())
+
+    if pack:
+        write_pack(pack, records)
+        return
+
+    os.makedirs(out_dir, exist_ok=True)
+    for name, record in records:
+        with open(os.path.join(out_dir, name + EXTENSION), 'wb') as file:
+            file.write(record)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Generate random nonograms with unique solutions')
+    parser.add_argument('--count', type=int, default=100)
+    parser.add_argument('--size', type=int, default=15)
+    parser.add_argument('--density', type=float, default=DENSITY, help='fraction of filled boxes')
+    parser.add_argument('--seed', type=int, default=0, help='seed of the first puzzle, the next ones count up')
+    parser.add_argument('--processes', type=int, help='worker processes, one per core by default')
+    parser.add_argument('--out', default='grids', help='directory to save the puzzles to')
+    parser.add_argument('--prefix', default='random', help='start of the names of the puzzles')
+    parser.add_argument('--pack', help='path of a pack file to write all the puzzles into instead')
+    args = parser.parse_args()
+
+    generate_batch(args.count, args.size, args.density, args.out, args.prefix, args.seed, args.processes, args.pack)
+
+
+if __name__ == '__main__':
+    main()
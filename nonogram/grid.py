@@ -0,0 +1,84 @@
+import numpy as np
+
+
+# Returns a list of lists of the lengths of the runs of filled boxes in each row of a 2-D array, [0] for empty rows.
+# The runs of all the rows are found at once where the filled mask, padded with an empty box at both ends of
+# every row, changes
+def get_guides(lines):
+    padded = np.zeros((lines.shape[0], lines.shape[1] + 2), dtype=np.int8)
+    padded[:, 1:-1] = lines == 1
+    edges = np.diff(padded, axis=1)
+    start_lines, starts = np.nonzero(edges == 1)
+    ends = np.nonzero(edges == -1)[1]
+
+    lengths = (ends - starts).tolist()
+    guides = []
+    first = 0
+    for count in np.bincount(start_lines, minlength=lines.shape[0]).tolist():
+        guides.append(lengths[first:first + count] or [0])
+        first += count
+
+    return guides
+
+
+# Returns the rows and columns of a size typed as '15' for a square grid or '10x20' for 10 rows of 20 boxes
+def parse_size(text):
+    rows, _, cols = text.lower().partition('x')
+    return int(rows), int(cols or rows)
+
+
+# A grid of height x width boxes, shared by the game and the editor. The boxes are stored in a 2-D uint8 array,
+# one byte per box: 0 for empty, 1 for filled and 2 for crossed
+class Grid:
+    # rect is where the grid is drawn. With a solution grid, the grid keeps track of which of its lines have
+    # the same guides as the solution
+    def __init__(self, matrix, rect=None, solution=None):
+        self.matrix = np.array(matrix, dtype=np.uint8)
+        self.height, self.width = self.matrix.shape
+        self.row_guides = self._get_row_guides()
+        self.col_guides = self._get_col_guides()
+        self.rect = rect
+        self.solution = solution
+        self.changed_boxes = set()  # Boxes set since the renderer last redrew them
+
+        if solution is not None:
+            self.row_solved = [nums == solution.row_guides[i] for i, nums in enumerate(self.row_guides)]
+            self.col_solved = [nums == solution.col_guides[i] for i, nums in enumerate(self.col_guides)]
+            self.unsolved_lines = self.row_solved.count(False) + self.col_solved.count(False)
+
+    # Returns a list of lists of numbers representing the consecutive black boxes in each row
+    def _get_row_guides(self):
+        return get_guides(self.matrix)
+
+    # Returns a list of lists of numbers representing the consecutive black boxes in each column
+    def _get_col_guides(self):
+        return get_guides(self.matrix.T)
+
+    # Returns the i-th column
+    def get_col(self, i):
+        return self.matrix[:, i]
+
+    # Returns the i-th row
+    def get_row(self, i):
+        return self.matrix[i]
+
+    # Get the state of a box
+    def get_box(self, row, col):
+        return self.matrix.item(row, col)
+
+    # Set the state of a box. Only the guides of its row and column can change
+    def set_box(self, row, col, state):
+        if self.matrix.item(row, col) == state:
+            return
+
+        self.matrix[row, col] = state
+        self.changed_boxes.add((row, col))
+        self.row_guides[row] = get_guides(self.matrix[row:row + 1])[0]
+        self.col_guides[col] = get_guides(self.matrix.T[col:col + 1])[0]
+
+        if self.solution is not None:
+            row_solved = self.row_guides[row] == self.solution.row_guides[row]
+            col_solved = self.col_guides[col] == self.solution.col_guides[col]
+            self.unsolved_lines += (self.row_solved[row] - row_solved) + (self.col_solved[col] - col_solved)
+            self.row_solved[row] = row_solved
+            self.col_solved[col] = col_solved
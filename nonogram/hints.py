@@ -0,0 +1,60 @@
+from solver import UNKNOWN, solve_line
+
+
+# Finds hints on the player's board with line logic: a box is forced when every placement of the guides of its row
+# or column that fits the boxes filled and crossed so far agrees on it. The result of every line is kept with the
+# line it was worked out for, so after a few edits only the lines that changed are solved again
+class HintEngine:
+    def __init__(self, row_guides, col_guides):
+        self.row_guides = [tuple(num for num in nums if num) for nums in row_guides]
+        self.col_guides = [tuple(num for num in nums if num) for nums in col_guides]
+        self.lines = {}  # (is_row, index): (line, index of the first forced box, its state), box None if none is
+        self.focus = []  # Lines to look at first, the ones changed last and the ones crossing them
+
+    # Solves a line and returns its cache entry. A contradicting line has its state None
+    def _solve(self, line_id, line):
+        is_row, index = line_id
+        solved = solve_line(self.row_guides[index] if is_row else self.col_guides[index], line)
+        if solved is None:
+            return line, None, None
+
+        for i, (old, new) in enumerate(zip(line, solved)):
+            if old == UNKNOWN and new != UNKNOWN:
+                return line, i, new
+
+        return line, None, UNKNOWN
+
+    # Returns a hint for a board, a 2-D array of box states: (is_row, index, None, None) for a line that contradicts
+    # its guides, (is_row, index, i, state) if box i of that line is forced to state, or None if no box can be
+    # deduced from a single line. Lines changed since the last hint and the lines crossing their changed boxes are
+    # looked at first, so the hint is near where the player is working
+    def get_hint(self, matrix):
+        rows = matrix.tolist()
+        lines = [((True, i), tuple(row)) for i, row in enumerate(rows)] + \
+                [((False, j), col) for j, col in enumerate(zip(*rows))]
+
+        changed = []
+        crossing = []
+        for line_id, line in lines:
+            cached = self.lines.get(line_id)
+            if cached is not None and cached[0] == line:
+                continue
+
+            if cached is not None:
+                crossing += [(not line_id[0], i) for i, (old, new) in enumerate(zip(cached[0], line)) if old != new]
+            self.lines[line_id] = self._solve(line_id, line)
+            changed.append(line_id)
+
+        if changed:
+            self.focus = changed + crossing
+
+        order = self.focus + [line_id for line_id, _ in lines]
+        for line_id in order:
+            if self.lines[line_id][2] is None:
+                return line_id[0], line_id[1], None, None
+        for line_id in order:
+            _, i, state = self.lines[line_id]
+            if i is not None:
+                return line_id[0], line_id[1], i, state
+
+        return None
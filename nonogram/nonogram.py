@@ -1,144 +1,252 @@
-import json
+import math
+import threading
 import time
 import pygame as pg
-from itertools import groupby, product
-from ui import EventManager, Button, InputBox, get_ui_font
-import random
+import numpy as np
+from ui import EventManager, Button, InputBox, ListBox, get_ui_font
+from generator import generate_grid, create_random_matrix
+from grid import Grid
+from puzzles import load_puzzle
+from catalog import Catalog
+from hints import HintEngine
+
+
+# Cached surfaces that draw_grid is composed of. The boxes and grid lines are cut into square tiles of about
+# TILE_LENGTH pixels, rasterized when they first come into view and again only after a box inside them changes.
+# The guides are cached per line. Only the tiles and guides in view of the screen are drawn,
+# so the cost of a frame depends on the size of the screen, not of the grid.
+# Everything is dropped when the grid or the zoom changes
+class GridLayers:
+    GUIDES_MARGIN = 15  # Gap between the row guides and the grid
+    COL_GUIDES_MARGIN = 10  # Gap between the column guides and the grid
+    TILE_LENGTH = 256
+    MAX_TILES = 256  # Tiles kept rasterized, least recently drawn ones are dropped first
+    MIN_CROSS_LENGTH = 8  # Boxes smaller than this are rasterized as plain colors, crosses would hardly be visible
+    MIN_FONT_SIZE = 5  # Guides smaller than this wouldn't be readable and aren't drawn
+
+    def __init__(self):
+        self.grid = None
+        self.box_length = None
+
+    def update(self):
+        if grid is not self.grid or box_length != self.box_length:
+            self._build()
+            return
+
+        for row, col in grid.changed_boxes:
+            self.tiles.pop((row // self.tile_boxes, col // self.tile_boxes), None)
+        grid.changed_boxes.clear()
+
+        for i, solved in enumerate(grid.row_solved):
+            if solved != self.row_solved[i]:
+                self.row_solved[i] = solved
+                self.row_guides.pop(i, None)
+        for i, solved in enumerate(grid.col_solved):
+            if solved != self.col_solved[i]:
+                self.col_solved[i] = solved
+                self.col_guides.pop(i, None)
+
+    def draw(self, surface):
+        first_row, last_row = self._get_visible_range(grid.rect.top, surface.height, grid.height)
+        first_col, last_col = self._get_visible_range(grid.rect.left, surface.width, grid.width)
+
+        blits = []
+        for tile_row in range(first_row // self.tile_boxes, (last_row - 1) // self.tile_boxes + 1):
+            for tile_col in range(first_col // self.tile_boxes, (last_col - 1) // self.tile_boxes + 1):
+                tile, x, y = self._get_tile(tile_row, tile_col)
+                blits.append((tile, (grid.rect.left + x, grid.rect.top + y)))
+        surface.fblits(blits)
+
+        # Draw grid border
+        pg.draw.rect(surface, GRID_BORDER_COL,
+                     (grid.rect.x, grid.rect.y, box_length * grid.width, box_length * grid.height), 3)
+
+        if self.font is None:
+            return
+
+        for i in range(first_row, last_row):
+            guides_surf = self._get_row_guides(i)
+            surface.blit(guides_surf, guides_surf.get_rect(right=grid.rect.left - self.GUIDES_MARGIN,
+                                                           centery=grid.rect.top + box_length / 2 + i * box_length))
+
+        for i in range(first_col, last_col):
+            guides_surf = self._get_col_guides(i)
+            surface.blit(guides_surf, guides_surf.get_rect(bottom=grid.rect.top - self.COL_GUIDES_MARGIN,
+                                                           centerx=grid.rect.left + box_length / 2 + i * box_length))
+
+    def _build(self):
+        self.grid = grid
+        self.box_length = box_length
+        self.tile_boxes = max(1, int(self.TILE_LENGTH // box_length))
+        self.tiles = {}
+        grid.changed_boxes.clear()
+
+        font_size = int(box_length * 22 // 48)
+        self.font = pg.font.Font('segoeui.ttf', font_size) if font_size >= self.MIN_FONT_SIZE else None
+        self.spacing_hor = font_size * 0.8
+        self.spacing_vert = font_size * 1.5
+        self.row_guides = {}
+        self.col_guides = {}
+        self.row_solved = list(grid.row_solved)
+        self.col_solved = list(grid.col_solved)
+
+    # Returns the first and one past the last index of the lines whose boxes are on screen along an axis
+    # with count boxes
+    @staticmethod
+    def _get_visible_range(grid_start, screen_length, count):
+        first = min(max(0, int(-grid_start // box_length)), count)
+        last = min(count, int((screen_length - grid_start) // box_length) + 1)
+        return first, max(first, last)
+
+    # Returns the pixel position a box boundary is drawn at, relative to the grid, along an axis with count boxes.
+    # Boxes are drawn a pixel longer than box_length, so the far edge of the grid is where the last box ends
+    @staticmethod
+    def _get_box_start(i, count):
+        return int(i * box_length) if i < count else int((count - 1) * box_length) + int(box_length + 1)
+
+    # Returns a tile and its position relative to the grid, rasterizing it if it isn't cached
+    def _get_tile(self, tile_row, tile_col):
+        row_start = tile_row * self.tile_boxes
+        col_start = tile_col * self.tile_boxes
+        row_end = min(row_start + self.tile_boxes, grid.height)
+        col_end = min(col_start + self.tile_boxes, grid.width)
+        x = self._get_box_start(col_start, grid.width)
+        y = self._get_box_start(row_start, grid.height)
+
+        tile = self.tiles.pop((tile_row, tile_col), None)
+        if tile is None:
+            tile = pg.Surface((self._get_box_start(col_end, grid.width) - x,
+                               self._get_box_start(row_end, grid.height) - y))
+            self._draw_boxes(tile, x, y, row_start, row_end, col_start, col_end)
+            self._draw_lines(tile, x, y, row_start, row_end, col_start, col_end)
+            if len(self.tiles) >= self.MAX_TILES:
+                del self.tiles[next(iter(self.tiles))]
+
+        # Reinsert the tile so the dict stays ordered from least to most recently drawn
+        self.tiles[tile_row, tile_col] = tile
+        return tile, x, y
+
+    def _draw_boxes(self, tile, x, y, row_start, row_end, col_start, col_end):
+        if box_length < self.MIN_CROSS_LENGTH:
+            # Scale an image with a pixel per box instead of drawing thousands of rects
+            colors = np.array([GRID_BG_COL, GRID_BORDER_COL, GRID_BG_COL], dtype=np.uint8)
+            boxes = colors[grid.matrix[row_start:row_end, col_start:col_end]].transpose(1, 0, 2)
+            pg.transform.scale(pg.surfarray.make_surface(boxes), tile.size, tile)
+            return
+
+        for i in range(row_start, row_end):
+            for j in range(col_start, col_end):
+                box_rect = (j * box_length - x, i * box_length - y, box_length + 1, box_length + 1)
+
+                if grid.get_box(i, j) == 0:
+                    pg.draw.rect(tile, GRID_BG_COL, box_rect)
+                elif grid.get_box(i, j) == 1:
+                    pg.draw.rect(tile, GRID_BORDER_COL, box_rect)
+                elif grid.get_box(i, j) == 2:
+                    pg.draw.rect(tile, GRID_BG_COL, box_rect)
+                    tile.blit(cross_image, box_rect)
+
+    # Draws the lines between the boxes of a tile and on its edges, so thick lines that straddle
+    # the edge between two tiles are drawn half in each
+    def _draw_lines(self, tile, x, y, row_start, row_end, col_start, col_end):
+        cols = range(max(1, col_start), min(grid.width - 1, col_end) + 1)
+        rows = range(max(1, row_start), min(grid.height - 1, row_end) + 1)
+        # Lines end on the last pixel inside the grid's far edges, where they're hidden under the grid border
+        bottom = min(tile.height, int(grid.height * box_length - 1) - y)
+        right = min(tile.width, int(grid.width * box_length - 1) - x)
+
+        for i in cols:
+            # Vertical line
+            pg.draw.line(tile, LINE_COL, (i * box_length - x, 0), (i * box_length - x, bottom))
+        for i in rows:
+            # Horizontal line
+            pg.draw.line(tile, LINE_COL, (0, i * box_length - y), (right, i * box_length - y))
+
+        for i in cols:
+            if i % 5 == 0:
+                # Vertical thick line
+                pg.draw.line(tile, THICK_LINE_COL, (i * box_length - x, 0), (i * box_length - x, bottom), 3)
+        for i in rows:
+            if i % 5 == 0:
+                # Horizontal thick line
+                pg.draw.line(tile, THICK_LINE_COL, (0, i * box_length - y), (right, i * box_length - y), 3)
+
+    # Returns a transparent surface to render guides of a color on. It's filled with the color at zero alpha, so
+    # the antialiased edges of the numbers keep their color instead of being blended with black
+    @staticmethod
+    def _create_guides_surface(width, height, color):
+        surface = pg.Surface((width, height), pg.SRCALPHA)
+        surface.fill((*color[:3], 0))
+        return surface
+
+    # Returns the width the numbers of a row take, with a pixel to spare for each number's rounded position
+    def _get_row_guides_width(self, nums):
+        return math.ceil(sum(self.font.size(str(num))[0] + 1 for num in nums) + self.spacing_hor * (len(nums) - 1))
+
+    # Returns the rendered guides of a row, from the cache if its solved state hasn't changed since
+    def _get_row_guides(self, i):
+        if i in self.row_guides:
+            return self.row_guides[i]
 
+        nums = solution.row_guides[i]
+        # If this row matches the solution guides, color the guides gray
+        text_color = pg.Color('dark gray') if grid.row_solved[i] else pg.Color('black')
 
-class Grid:
-    def __init__(self, matrix, rect=pg.Rect(0, 0, 0, 0)):
-        self.matrix = matrix
-        self.row_guides = self._get_row_guides()
-        self.col_guides = self._get_col_guides()
-        self.rect = rect
-
-    # Returns a list of lists of numbers representing the consecutive black boxes in each row
-    def _get_row_guides(self):
-        guides = []
-
-        for i in range(len(self.matrix)):
-            nums = [len(list(group)) for key, group in groupby(self.get_row(i)) if key == 1]
-
-            if not nums:
-                guides.append([0])
-            else:
-                guides.append(nums)
-
-        return guides
-
-    # Returns a list of lists of numbers representing the consecutive black boxes in each column
-    def _get_col_guides(self):
-        guides = []
-
-        for i in range(len(self.matrix)):
-            nums = [len(list(group)) for key, group in groupby(self.get_col(i)) if key == 1]
-
-            if not nums:
-                guides.append([0])
-            else:
-                guides.append(nums)
+        guides_surf = self._create_guides_surface(self._get_row_guides_width(nums), self.font.get_height(), text_color)
+        right = guides_surf.width
+        for j in range(len(nums)):
+            text_surf = self.font.render(str(nums[-1 - j]), True, text_color)
+            text_rect = text_surf.get_rect(right=right)
+            guides_surf.blit(text_surf, text_rect)
+            right = text_rect.left - self.spacing_hor
 
-        return guides
+        self.row_guides[i] = guides_surf
+        return guides_surf
 
-    # Returns the i-th column
-    def get_col(self, i):
-        return list(map(lambda row: row[i], self.matrix))
+    # Returns the rendered guides of a column, from the cache if its solved state hasn't changed since
+    def _get_col_guides(self, i):
+        if i in self.col_guides:
+            return self.col_guides[i]
 
-    # Returns the i-th row
-    def get_row(self, i):
-        return self.matrix[i]
+        nums = solution.col_guides[i]
+        # If this column matches the solution guides, color the guides gray
+        text_color = pg.Color('dark gray') if grid.col_solved[i] else pg.Color('black')
 
-    # Get the state of a box
-    def get_box(self, row, col):
-        return self.matrix[row][col]
+        text_surfs = [self.font.render(str(num), True, text_color) for num in reversed(nums)]
+        guides_surf = self._create_guides_surface(max(text_surf.width for text_surf in text_surfs),
+                                                  math.ceil(self.spacing_vert * (len(nums) - 1))
+                                                  + self.font.get_height(), text_color)
+        for j, text_surf in enumerate(text_surfs):
+            guides_surf.blit(text_surf, text_surf.get_rect(bottom=guides_surf.height - j * self.spacing_vert,
+                                                           centerx=guides_surf.width / 2))
 
-    # Set the state of a box
-    def set_box(self, row, col, state):
-        self.matrix[row][col] = state
-        self.row_guides = self._get_row_guides()
-        self.col_guides = self._get_col_guides()
+        self.col_guides[i] = guides_surf
+        return guides_surf
 
 
 def draw_grid():
-    # Draw grid boxes
-    for i in range(grid_size):
-        for j in range(grid_size):
-            box_rect = (grid.rect.x + j * box_length, grid.rect.y + i * box_length, box_length + 1, box_length + 1)
-
-            if grid.get_box(i, j) == 0:
-                pg.draw.rect(screen, GRID_BG_COL, box_rect)
-            elif grid.get_box(i, j) == 1:
-                pg.draw.rect(screen, GRID_BORDER_COL, box_rect)
-            elif grid.get_box(i, j) == 2:
-                pg.draw.rect(screen, GRID_BG_COL, box_rect)
-                screen.blit(cross_image, box_rect)
-
-    # Draw grid lines
-    for i in range(grid_size - 1):
-        pass
-        # Vertical line
-        pg.draw.line(screen, LINE_COL,
-                     (grid.rect.x + (i + 1) * box_length, grid.rect.y),
-                     (grid.rect.x + (i + 1) * box_length, grid.rect.y + grid_size * box_length - 1))
-        # Horizontal line
-        pg.draw.line(screen, LINE_COL,
-                     (grid.rect.x, grid.rect.y + (i + 1) * box_length),
-                     (grid.rect.x + grid_size * box_length - 1, grid.rect.y + (i + 1) * box_length))
-
-    for i in range(4, grid_size - 1, 5):
-        # Vertical thick line
-        pg.draw.line(screen, THICK_LINE_COL,
-                     (grid.rect.x + (i + 1) * box_length, grid.rect.y),
-                     (grid.rect.x + (i + 1) * box_length, grid.rect.y + grid_size * box_length - 1), 3)
-        # Horizontal thick line
-        pg.draw.line(screen, THICK_LINE_COL,
-                     (grid.rect.x, grid.rect.y + (i + 1) * box_length),
-                     (grid.rect.x + grid_size * box_length - 1, grid.rect.y + (i + 1) * box_length), 3)
-
-    # Draw grid border
-    pg.draw.rect(screen, GRID_BORDER_COL,
-                 (grid.rect.x, grid.rect.y, box_length * grid_size, box_length * grid_size), 3)
-
-    # Draw guides
-    font_size = int(box_length * 22 // 48)
-    guides_font = pg.font.Font('segoeui.ttf', font_size)
-    spacing_hor = font_size * 0.8
-    spacing_vert = font_size * 1.5
-
-    for i in range(grid_size):
-        nums = solution.row_guides[i]
-        # If this row matches the solution guides, color the guides gray
-        text_color = pg.Color('dark gray') if nums == grid.row_guides[i] else pg.Color('black')
+    grid_layers.update()
+    grid_layers.draw(screen)
 
-        prev_left = grid.rect.left - 15 + spacing_hor
-        for j in range(len(nums)):
-            text = str(nums[-1 - j])
-            text_surf = guides_font.render(text, True, text_color)
-            text_rect = text_surf.get_rect(right=prev_left - spacing_hor,
-                                           centery=grid.rect.top + box_length / 2 + i * box_length)
-            screen.blit(text_surf, text_rect)
-            prev_left = text_surf.get_rect(right=prev_left - spacing_hor).left
-
-    for i in range(grid_size):
-        nums = solution.col_guides[i]
-        # If this column matches the solution guides, color the guides gray
-        text_color = pg.Color('dark gray') if nums == grid.col_guides[i] else pg.Color('black')
 
-        for j in range(len(nums)):
-            text = str(nums[-1 - j])
-            text_surf = guides_font.render(text, True, text_color)
-            text_rect = text_surf.get_rect(bottom=grid.rect.top - 10 - j * spacing_vert,
-                                           centerx=grid.rect.left + box_length / 2 + i * box_length)
-            screen.blit(text_surf, text_rect)
+def is_grid_solved():
+    return grid.unsolved_lines == 0
 
 
-def is_grid_solved():
-    for i in range(grid_size):
-        if not grid.row_guides[i] == solution.row_guides[i] or not grid.col_guides[i] == solution.col_guides[i]:
-            return False
+# Outlines the box of the hint, or its whole line if the line contradicts its guides
+def draw_hint():
+    is_row, index, i, state = hint
+    row, col = (index, i) if is_row else (i, index)
 
-    return True
+    if i is not None:
+        rect = (grid.rect.x + col * box_length, grid.rect.y + row * box_length, box_length, box_length)
+        pg.draw.rect(screen, HINT_COL, rect, width=3)
+    elif is_row:
+        pg.draw.rect(screen, CONTRADICTION_COL, (grid.rect.x, grid.rect.y + row * box_length, grid.rect.width,
+                                                 box_length), width=3)
+    else:
+        pg.draw.rect(screen, CONTRADICTION_COL, (grid.rect.x + col * box_length, grid.rect.y, box_length,
+                                                 grid.rect.height), width=3)
 
 
 def on_quit(e):
@@ -146,9 +254,15 @@ def on_quit(e):
     running = False
 
 
+# Dialogs take the clicks and scrolling over them instead of the grid
+def is_mouse_over_dialog():
+    return any(sprite.rect.collidepoint(pg.mouse.get_pos()) for sprite in sprites if sprite.tag == 'inputbox')
+
+
 def on_mouse_down(e):
     global mb_pressed
-    mb_pressed = e.button
+    if not is_mouse_over_dialog():
+        mb_pressed = e.button
 
 
 def on_mouse_up(e):
@@ -160,21 +274,27 @@ def on_mouse_up(e):
 def on_key_down(e):
     if e.key == pg.K_ESCAPE:
         kill_sprites_with_tag('inputbox')
+    elif e.key == pg.K_h and not any(sprite.tag == 'inputbox' for sprite in sprites):
+        on_hint_button_pressed()
 
 
 # Zooming
 def on_mousewheel(e):
     global zoom, margin_topleft, box_length, grid, cross_image
 
+    if is_mouse_over_dialog():
+        return
+
     zoom_speed = 60
+    grid_size = max(grid.height, grid.width)
     margin_topleft = min(300 + grid_size * 0.1, margin_topleft - zoom_speed * e.y)
     box_length = (screen.width - MARGIN_BOTTOMRIGHT - margin_topleft) / grid_size
 
     mouse_x, mouse_y = pg.mouse.get_pos()
     prev_width = grid.rect.width
     prev_height = grid.rect.height
-    grid.rect.width = box_length * grid_size
-    grid.rect.height = box_length * grid_size
+    grid.rect.width = box_length * grid.width
+    grid.rect.height = box_length * grid.height
     grid.rect.x = grid.rect.x * grid.rect.width / prev_width - mouse_x * (grid.rect.width / prev_width - 1)
     grid.rect.y = grid.rect.y * grid.rect.height / prev_height - mouse_y * (grid.rect.height / prev_height - 1)
 
@@ -203,7 +323,7 @@ def on_mouse_pressed():
         (3, 2): 0,
     }
 
-    if 0 < col_clicked < grid_size and 0 < row_clicked < grid_size:  # if mouse on grid
+    if 0 < col_clicked < grid.width and 0 < row_clicked < grid.height:  # if mouse on grid
         row = int(row_clicked)
         col = int(col_clicked)
         box_state = grid.get_box(row, col)
@@ -214,34 +334,95 @@ def on_mouse_pressed():
 
         # Only change state if this box has the same state as the box changed first with this mouse press
         if (mb_pressed, box_state) in toggle_map and box_state == first_changed_state:
+            global hint, hint_text
             grid.set_box(row, col, toggle_map[(mb_pressed, box_state)])
+            hint = None
+            hint_text = ''
 
 
-def load_grid(name):
-    global grid, solution, grid_size, box_length, margin_topleft, won, grid_name, start_time, cross_image
+# Starts a new game of a solution grid, with the box length set so its longer side fits the screen
+def start_grid(solution_grid, name):
+    global grid, solution, box_length, margin_topleft, won, grid_name, start_time, cross_image, hint_engine, hint, \
+        hint_text
 
-    with open(f'grids/{name}.json') as file:
-        solution = Grid(json.load(file))
-
-    grid_size = len(solution.matrix)
+    solution = solution_grid
+    grid_size = max(solution.height, solution.width)
     margin_topleft = 200 + grid_size * 0.1
     box_length = (screen.width - MARGIN_BOTTOMRIGHT - margin_topleft) / grid_size
-    grid = Grid([[0] * grid_size for _ in range(grid_size)],
-                pg.Rect(margin_topleft, margin_topleft, box_length * grid_size, box_length * grid_size))
+    grid = Grid(np.zeros((solution.height, solution.width)),
+                pg.Rect(margin_topleft, margin_topleft, box_length * solution.width, box_length * solution.height),
+                solution)
     won = False
     grid_name = name
     cross_image = pg.transform.scale(orig_cross_image, (box_length, box_length))
+    hint_engine = HintEngine(solution.row_guides, solution.col_guides)
+    hint = None
+    hint_text = ''
     start_time = time.time()
 
 
+def load_grid(name):
+    start_grid(Grid(load_puzzle(name)), name)
+
+
+# Opens a browser of the puzzles in the catalog. The catalog is refreshed on a background thread, reading and rating
+# only the files changed since, so the puzzles already in it are listed right away and the list is updated as new
+# ones are read and rated. Clicking the title of a column sorts the puzzles by it, puzzles the solver gave up on
+# are the hardest
 def on_load_button_pressed():
+    global catalog_thread
     kill_sprites_with_tag('inputbox')
-    load_input_box = InputBox(screen.get_rect().center,
-                              'Name of the grid to load:',
-                              lambda: load_grid(load_input_box.text),
-                              event_manager,
-                              'inputbox')
-    sprites.add(load_input_box)
+    if catalog_thread is None or not catalog_thread.is_alive():
+        catalog_thread = threading.Thread(target=catalog.refresh, daemon=True)
+        catalog_thread.start()
+
+    shown_entries = catalog.entries
+    entries = list(shown_entries)
+    sort_column = 0
+    sort_keys = [lambda entry: entry['name'],
+                 lambda entry: entry['rows'] * entry['cols'],
+                 lambda entry: entry['density'],
+                 lambda entry: math.inf if entry.get('difficulty') is None else entry['difficulty']]
+
+    def get_tooltip():
+        return f'Grids to load ({len(entries)}){", rating..." if catalog_thread.is_alive() else ""}:'
+
+    def get_row(i):
+        entry = entries[i]
+        if 'difficulty' not in entry:
+            difficulty = '...'  # Not rated yet
+        else:
+            difficulty = '?' if entry['difficulty'] is None else str(entry['difficulty'])
+        return entry['name'], f'{entry["rows"]}x{entry["cols"]}', f'{entry["density"]:.0%}', difficulty
+
+    def sort_entries(column):
+        nonlocal sort_column
+        sort_column = column
+        entries.sort(key=sort_keys[column])
+        browser.set_rows(len(entries), get_row)
+
+    # Shows the entries of the catalog once the refresh has replaced them, keeping the sorting and scrolling
+    def update_entries():
+        nonlocal shown_entries
+        if catalog.entries is shown_entries and browser.tooltip == get_tooltip():
+            return
+
+        shown_entries = catalog.entries
+        entries[:] = sorted(shown_entries, key=sort_keys[sort_column])
+        browser.tooltip = get_tooltip()
+        browser.set_rows(len(entries), get_row, keep_position=True)
+
+    browser = ListBox(screen.get_rect().center,
+                      get_tooltip(),
+                      [('Name', 230), ('Size', 90), ('Fill', 70), ('Difficulty', 90)],
+                      len(entries),
+                      get_row,
+                      lambda i: load_grid(entries[i]['name']),
+                      event_manager,
+                      'inputbox',
+                      on_column_click=sort_entries,
+                      on_update=update_entries)
+    sprites.add(browser)
 
 
 def on_random_button_pressed():
@@ -255,31 +436,37 @@ def on_random_button_pressed():
 
 
 def on_solve_button_pressed():
-    for i in range(grid_size):
-        for j in range(grid_size):
-            grid.set_box(i, j, solution.get_box(i, j))
+    global hint, hint_text
+    for row, col in np.argwhere(grid.matrix != solution.matrix).tolist():
+        grid.set_box(row, col, solution.get_box(row, col))
+    hint = None
+    hint_text = ''
 
 
-def create_random_grid(size):
-    global grid, solution, grid_size, box_length, margin_topleft, won, grid_name, start_time, cross_image
+# Finds the next box that can be deduced from the guides and the boxes filled and crossed so far
+def on_hint_button_pressed():
+    global hint, hint_text
+    hint = hint_engine.get_hint(grid.matrix)
 
-    grid_size = size
-    margin_topleft = 200 + grid_size * 0.1
-    box_length = (screen.width - MARGIN_BOTTOMRIGHT - margin_topleft) / grid_size
-    grid = Grid([[0] * grid_size for _ in range(grid_size)],
-                pg.Rect(margin_topleft, margin_topleft, box_length * grid_size, box_length * grid_size))
-    solution = Grid([[0] * grid_size for _ in range(grid_size)],
-                    pg.Rect(margin_topleft, margin_topleft, box_length * grid_size, box_length * grid_size))
-    won = False
-    grid_name = ''
-    cross_image = pg.transform.scale(orig_cross_image, (box_length, box_length))
+    if hint is None:
+        hint_text = 'No box follows from a single line'
+        return
 
-    density = 0.7
-    random_boxes = random.sample(list(product(range(size), repeat=2)), int((grid_size ** 2) * density))
-    for box in random_boxes:
-        solution.set_box(box[0], box[1], 1)
+    is_row, index, i, state = hint
+    if i is None:
+        hint_text = f'{"Row" if is_row else "Column"} {index + 1} contradicts its guides'
+    else:
+        row, col = (index, i) if is_row else (i, index)
+        hint_text = f'{"Fill" if state == 1 else "Cross"} row {row + 1}, column {col + 1}'
 
-    start_time = time.time()
+
+def create_random_grid(size):
+    # Bigger grids would take too long to check for a unique solution
+    matrix = generate_grid(size) if size <= UNIQUE_MAX_SIZE else None
+    if matrix is None:
+        matrix = create_random_matrix(size)
+
+    start_grid(Grid(matrix), '')
 
 
 def kill_sprites_with_tag(tag):
@@ -307,13 +494,21 @@ mb_pressed = 0  # Mouse button currently being pressed
 first_changed_state = None  # State of the box over which the current mouse press began
 won = False
 grid_name = ''
+hint = None  # Last hint of the hint engine and its description, cleared when the player changes a box
+hint_text = ''
+grid_layers = GridLayers()
+catalog = Catalog()
+catalog_thread = None  # Thread refreshing the catalog, started by the first "Load grid"
 
 # Constants
 MARGIN_BOTTOMRIGHT = 65
+UNIQUE_MAX_SIZE = 60  # Largest random grid generated with a unique solution
 GRID_BG_COL = (190, 190, 190)
 LINE_COL = (150, 150, 150)
 THICK_LINE_COL = (130, 130, 130)
 GRID_BORDER_COL = (10, 10, 10)
+HINT_COL = (40, 120, 220)
+CONTRADICTION_COL = (220, 40, 40)
 
 # Add event listeners
 event_manager = EventManager()
@@ -329,12 +524,15 @@ sprites = pg.sprite.Group()
 sprites.add(Button((75, screen.height - 33), on_load_button_pressed, 'Load grid', event_manager))
 sprites.add(Button((210, screen.height - 33), on_random_button_pressed, 'Random grid', event_manager))
 sprites.add(Button((365, screen.height - 33), on_solve_button_pressed, 'Show solution', event_manager))
+sprites.add(Button((480, screen.height - 33), on_hint_button_pressed, 'Hint', event_manager))
 
 create_random_grid(10)
 
 while running:
     screen.fill(pg.color.Color('white'))
     draw_grid()
+    if hint:
+        draw_hint()
     sprites.update()
     sprites.draw(screen)
 
@@ -351,7 +549,7 @@ while running:
     elapsed_text = font.render(time.strftime('%M:%S', elapsed_time), True, GRID_BORDER_COL)
     screen.blit(elapsed_text, elapsed_text.get_rect(right=screen.get_rect().right - 8, top=4))
 
-    name_text = font.render(f'{grid_name}  [{grid_size}x{grid_size}]', True, GRID_BORDER_COL)
+    name_text = font.render(hint_text or f'{grid_name}  [{grid.height}x{grid.width}]', True, GRID_BORDER_COL)
     screen.blit(name_text, name_text.get_rect(centerx=screen.get_rect().centerx, top=4))
 
     pg.display.flip()
@@ -0,0 +1,224 @@
+import argparse
+import json
+import mmap
+import os
+import struct
+import numpy as np
+from grid import get_guides
+
+# A puzzle record is a header, the boxes bit-packed row after row with 1 for filled, then the guides: the number of
+# guides of every row and then every column, followed by all their numbers. Guides are stored so they can be read
+# without unpacking the boxes. Numbers take a byte each, or two in puzzles with lines longer than 255 boxes
+MAGIC = b'NONO'
+VERSION = 1
+HEADER = struct.Struct('<4sBHH')  # magic, version, rows, columns
+
+# A puzzle pack is a header, the records of its puzzles one after another and an index at the end that maps
+# each name to the offset and size of its record, so a single puzzle can be read without parsing the others
+PACK_MAGIC = b'NPAK'
+PACK_HEADER = struct.Struct('<4sBIQ')  # magic, version, puzzle count, index offset
+PACK_ENTRY = struct.Struct('<QIH')  # record offset, record size, name length, followed by the name in UTF-8
+
+LIBRARY = 'grids'
+EXTENSION = '.non'
+PACK_EXTENSION = '.nonpack'
+
+
+def _get_guides_dtype(rows, cols):
+    return np.dtype(np.uint8) if max(rows, cols) <= 255 else np.dtype('<u2')
+
+
+# Returns the record of a matrix of box states. Crosses are stored as empty boxes
+def encode_puzzle(matrix):
+    matrix = np.asarray(matrix, dtype=np.uint8)
+    rows, cols = matrix.shape
+    dtype = _get_guides_dtype(rows, cols)
+    guides = [[num for num in nums if num] for nums in get_guides(matrix) + get_guides(matrix.T)]
+
+    return b''.join((HEADER.pack(MAGIC, VERSION, rows, cols),
+                     np.packbits(matrix == 1).tobytes(),
+                     np.array([len(nums) for nums in guides], dtype=dtype).tobytes(),
+                     np.array([num for nums in guides for num in nums], dtype=dtype).tobytes()))
+
+
+# Returns the rows and columns of a record
+def read_header(record):
+    if len(record) < HEADER.size:
+        raise ValueError('Puzzle record is too short')
+
+    magic, version, rows, cols = HEADER.unpack_from(record)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError(f'Not a version {VERSION} puzzle record')
+
+    return rows, cols
+
+
+# Returns the boxes of a record as a 2-D uint8 array
+def decode_puzzle(record):
+    rows, cols = read_header(record)
+    bits = np.frombuffer(record, np.uint8, (rows * cols + 7) // 8, HEADER.size)
+    return np.unpackbits(bits, count=rows * cols).reshape(rows, cols)
+
+
+# Returns the row and column guides of a record, read from the stored guides rather than the boxes
+def decode_guides(record):
+    rows, cols = read_header(record)
+    dtype = _get_guides_dtype(rows, cols)
+    offset = HEADER.size + (rows * cols + 7) // 8
+    counts = np.frombuffer(record, dtype, rows + cols, offset)
+    nums = np.frombuffer(record, dtype, int(counts.sum()), offset + counts.nbytes).tolist()
+
+    guides = []
+    first = 0
+    for count in counts.tolist():
+        guides.append(nums[first:first + count] or [0])
+        first += count
+
+    return guides[:rows], guides[rows:]
+
+
+# Read-only view of a puzzle pack. The file is memory-mapped and only the index is read up front,
+# each record is read when it's asked for
+class PuzzlePack:
+    def __init__(self, path):
+        with open(path, 'rb') as file:
+            self.data = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        if len(self.data) < PACK_HEADER.size:
+            raise ValueError(f'{path} is too short to be a puzzle pack')
+        magic, version, count, index_offset = PACK_HEADER.unpack_from(self.data)
+        if magic != PACK_MAGIC or version != VERSION:
+            raise ValueError(f'{path} is not a version {VERSION} puzzle pack')
+
+        self.path = path
+        self.index = {}
+        position = index_offset
+        try:
+            for _ in range(count):
+                offset, size, name_length = PACK_ENTRY.unpack_from(self.data, position)
+                position += PACK_ENTRY.size
+                name = self.data[position:position + name_length].decode()
+                position += name_length
+                if offset + size > index_offset or position > len(self.data):
+                    raise ValueError(f'{path} has an index entry past the end of its data')
+                self.index[name] = (offset, size)
+        except struct.error:
+            raise ValueError(f'{path} has a truncated index') from None
+
+    # Returns the names of the puzzles in the order they were written
+    def get_names(self):
+        return list(self.index)
+
+    # Returns the record of a puzzle, still backed by the file
+    def get_record(self, name):
+        offset, size = self.index[name]
+        return memoryview(self.data)[offset:offset + size]
+
+    # Drops the memory map, which is unmapped once no record returned from it is still referenced
+    def close(self):
+        self.index = {}
+        self.data = None
+
+
+# Writes a pack of the (name, matrix or record) pairs of puzzles, which can be any iterable so puzzles can be
+# streamed into it as they are made
+def write_pack(path, puzzles):
+    index = []
+    with open(path, 'wb') as file:
+        file.write(PACK_HEADER.pack(PACK_MAGIC, VERSION, 0, 0))
+
+        for name, puzzle in puzzles:
+            record = puzzle if isinstance(puzzle, (bytes, memoryview)) else encode_puzzle(puzzle)
+            index.append((name, file.tell(), len(record)))
+            file.write(record)
+
+        index_offset = file.tell()
+        for name, offset, size in index:
+            encoded_name = name.encode()
+            file.write(PACK_ENTRY.pack(offset, size, len(encoded_name)) + encoded_name)
+
+        file.seek(0)
+        file.write(PACK_HEADER.pack(PACK_MAGIC, VERSION, len(index), index_offset))
+
+
+_packs = {}  # Open packs by path, with the modification time and size their file had when it was opened
+
+
+# Returns the pack at a path, kept open until its file is modified or replaced
+def get_pack(path):
+    stat = os.stat(path)
+    key = (stat.st_mtime_ns, stat.st_size)
+    if path in _packs:
+        pack, pack_key = _packs[path]
+        if pack_key == key:
+            return pack
+        del _packs[path]
+        pack.close()
+
+    pack = PuzzlePack(path)
+    _packs[path] = (pack, key)
+    return pack
+
+
+# Returns the record of a puzzle in the library. Puzzles in a pack are named '<pack>/<puzzle>'
+def load_record(name, directory=LIBRARY):
+    pack_name, _, puzzle_name = name.rpartition('/')
+    if pack_name:
+        return get_pack(os.path.join(directory, pack_name + PACK_EXTENSION)).get_record(puzzle_name)
+
+    path = os.path.join(directory, name + EXTENSION)
+    if os.path.exists(path):
+        with open(path, 'rb') as file:
+            return file.read()
+
+    return encode_puzzle(import_json(os.path.join(directory, name + '.json')))
+
+
+# Returns the boxes of a puzzle in the library as a 2-D uint8 array, from its binary file or its pack,
+# or imported from a JSON file of the same name
+def load_puzzle(name, directory=LIBRARY):
+    return decode_puzzle(load_record(name, directory))
+
+
+# Saves a matrix of box states to the library in the binary format
+def save_puzzle(name, matrix, directory=LIBRARY):
+    with open(os.path.join(directory, name + EXTENSION), 'wb') as file:
+        file.write(encode_puzzle(matrix))
+
+
+# Returns the matrix of a JSON file, a list of rows of box states
+def import_json(path):
+    with open(path) as file:
+        return np.array(json.load(file), dtype=np.uint8)
+
+
+def export_json(path, matrix):
+    with open(path, 'w') as file:
+        json.dump(np.asarray(matrix).tolist(), file)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Convert nonograms between JSON, binary files and packs')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    pack_parser = subparsers.add_parser('pack', help='write library puzzles into one pack')
+    pack_parser.add_argument('out', help='path of the pack to write')
+    pack_parser.add_argument('names', nargs='+', help='names of the puzzles in the library')
+    import_parser = subparsers.add_parser('import', help='save JSON files to the library in the binary format')
+    import_parser.add_argument('paths', nargs='+')
+    export_parser = subparsers.add_parser('export', help='write a library puzzle as a JSON file')
+    export_parser.add_argument('name')
+    export_parser.add_argument('out')
+    parser.add_argument('--library', default=LIBRARY, help='directory of the puzzle library')
+    args = parser.parse_args()
+
+    if args.command == 'pack':
+        write_pack(args.out, ((name.rpartition('/')[2], load_record(name, args.library)) for name in args.names))
+    elif args.command == 'import':
+        for path in args.paths:
+            save_puzzle(os.path.splitext(os.path.basename(path))[0], import_json(path), args.library)
+    else:
+        export_json(args.out, load_puzzle(args.name, args.library))
+
+
+if __name__ == '__main__':
+    main()
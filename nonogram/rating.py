@@ -0,0 +1,41 @@
+import sys
+import time
+from solver import Solver
+from generator import MAX_GUESSES
+from puzzles import decode_guides, load_record
+
+
+# Returns how hard a puzzle is from the effort the solver puts into it. The difficulty is the number of times
+# each line was solved on average, which grows with the rounds of propagation the puzzle takes, the probing
+# when propagation gets stuck and the guesses that are backtracked, and doesn't depend on how fast the machine is.
+# It's None if the solver gave up guessing, then the puzzle can't be rated
+def rate_puzzle(row_guides, col_guides):
+    solver = Solver(row_guides, col_guides, MAX_GUESSES)
+    start = time.perf_counter()
+    solutions = solver.solve(max_solutions=2)
+    elapsed = time.perf_counter() - start
+
+    return {
+        'difficulty': None if solver.gave_up else round(solver.line_solves / (len(row_guides) + len(col_guides)), 1),
+        'unique': not solver.gave_up and len(solutions) == 1,
+        'rounds': solver.rounds,
+        'line_solves': solver.line_solves,
+        'probes': solver.probes,
+        'guesses': solver.guesses,
+        'depth': solver.depth,
+        'time': round(elapsed, 6),
+    }
+
+
+# Returns the rating of a puzzle record, read from its guides
+def rate_record(record):
+    return rate_puzzle(*decode_guides(record))
+
+
+# Rates the named puzzles of the library, e.g. python rating.py apple classic/snail
+if __name__ == '__main__':
+    for name in sys.argv[1:]:
+        rating = rate_record(load_record(name))
+        print(f'{name}: difficulty {rating["difficulty"]}, {"unique" if rating["unique"] else "not unique"}, '
+              f'{rating["rounds"]} rounds, {rating["line_solves"]} line solves, {rating["probes"]} probes, '
+              f'{rating["guesses"]} guesses {rating["depth"]} deep, {rating["time"] * 1000:.1f}ms')
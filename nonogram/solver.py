@@ -0,0 +1,340 @@
+import sys
+import time
+from collections import deque
+from functools import lru_cache
+from itertools import groupby
+from puzzles import decode_guides, load_record
+
+# Box states, the same as the player's grid: unknown boxes are the ones that are neither filled nor crossed
+UNKNOWN = 0
+FILLED = 1
+CROSSED = 2
+
+
+# Returns the guides of a line in the same form as Grid, [0] for a line without filled boxes
+def get_line_guides(line):
+    nums = [len(list(group)) for key, group in groupby(line) if key == FILLED]
+    return nums if nums else [0]
+
+
+# Returns the line with every box that all placements of the guides agree on filled or crossed,
+# or None if the guides can't be placed in the line at all.
+# Both arguments must be tuples so the result can be cached, and guides must not contain the 0 of empty lines
+@lru_cache(maxsize=1 << 16)
+def solve_line(guides, line):
+    n = len(line)
+    k = len(guides)
+
+    # crossed_before[i] is the number of crossed boxes in line[:i], so a block fits in line[i:j]
+    # if crossed_before[j] == crossed_before[i]
+    crossed_before = [0] * (n + 1)
+    for i, state in enumerate(line):
+        crossed_before[i + 1] = crossed_before[i] + (state == CROSSED)
+
+    # block_ends[length][i] is the index after the gap following a block of that length placed at i,
+    # or -1 if it doesn't fit there
+    block_ends = {}
+    for length in set(guides):
+        ends = [-1] * n
+        for i in range(n - length + 1):
+            end = i + length
+            if crossed_before[end] == crossed_before[i]:
+                if end == n:
+                    ends[i] = n
+                elif line[end] != FILLED:
+                    ends[i] = end + 1
+        block_ends[length] = ends
+
+    # Block j can only start between first_starts[j] and last_starts[j], with the blocks before it packed to the
+    # left or the blocks from it on packed to the right
+    first_starts = [0] * (k + 1)
+    for j in range(k):
+        first_starts[j + 1] = first_starts[j] + guides[j] + 1
+    last_starts = [n] * (k + 1)
+    for j in range(k - 1, -1, -1):
+        last_starts[j] = last_starts[j + 1] - guides[j] - (j < k - 1)
+
+    # fits[j][i] tells whether the blocks from j on can be placed in line[i:]
+    fits = [[False] * (n + 1) for _ in range(k + 1)]
+    fits[k][n] = True
+    for i in range(n - 1, -1, -1):
+        fits[k][i] = fits[k][i + 1] and line[i] != FILLED
+
+    for j in range(k - 1, -1, -1):
+        row = fits[j]
+        next_row = fits[j + 1]
+        ends = block_ends[guides[j]]
+        for i in range(last_starts[j], first_starts[j] - 1, -1):
+            if line[i] != FILLED and row[i + 1]:
+                row[i] = True
+            else:
+                end = ends[i]
+                row[i] = end != -1 and next_row[end]
+
+    if not fits[0][0]:
+        return None
+
+    # Walk every placement that fits from the start, recording which boxes can be filled and which crossed.
+    # Filled ranges go in a difference array so each block placement costs O(1)
+    fill_diff = [0] * (n + 1)
+    can_cross = [False] * n
+    reached = [[False] * (n + 1) for _ in range(k + 1)]
+    reached[0][0] = True
+
+    for j in range(k + 1):
+        row = reached[j]
+        fits_row = fits[j]
+        for i in range(first_starts[j], min(last_starts[j] + 1, n)):
+            if not row[i] or not fits_row[i]:
+                continue
+
+            # Leave box i empty
+            if line[i] != FILLED and fits_row[i + 1]:
+                can_cross[i] = True
+                row[i + 1] = True
+
+            # Start block j at box i
+            if j < k:
+                end = block_ends[guides[j]][i]
+                if end != -1 and fits[j + 1][end]:
+                    fill_diff[i] += 1
+                    fill_diff[i + guides[j]] -= 1
+                    if end > i + guides[j]:
+                        can_cross[i + guides[j]] = True
+                    reached[j + 1][end] = True
+
+    result = []
+    fill_count = 0
+    for i in range(n):
+        fill_count += fill_diff[i]
+        if fill_count and can_cross[i]:
+            result.append(UNKNOWN)
+        elif fill_count:
+            result.append(FILLED)
+        else:
+            result.append(CROSSED)
+
+    return tuple(result)
+
+
+# Solves nonograms from their guides: lines are settled with solve_line, only the lines crossing a changed box
+# are revisited, and when no line can be settled any further the solver probes boxes of the lines that changed
+# since it last got stuck, then guesses a box and backtracks.
+# At most max_probes boxes are probed each time, by default as many as the longer side of the grid.
+# With max_guesses, the search gives up after that many guesses and sets gave_up.
+# The effort of the last solve is counted in rounds (of propagation, the lines queued when a round began are
+# solved in it), line_solves, probes (boxes tried while probing), guesses and depth (of the deepest guess)
+class Solver:
+    def __init__(self, row_guides, col_guides, max_guesses=None, max_probes=None):
+        self.row_guides = [tuple(num for num in nums if num) for nums in row_guides]
+        self.col_guides = [tuple(num for num in nums if num) for nums in col_guides]
+        self.height = len(row_guides)
+        self.width = len(col_guides)
+        self.max_guesses = max_guesses
+        self.max_probes = max(self.height, self.width) if max_probes is None else max_probes
+        self.gave_up = False
+        self.rounds = 0
+        self.line_solves = 0
+        self.probes = 0
+        self.guesses = 0
+        self.depth = 0
+
+    # Returns up to max_solutions solutions, each a list of rows of 0 (empty) and 1 (filled)
+    def solve(self, max_solutions=2):
+        self.gave_up = False
+        self.rounds = 0
+        self.line_solves = 0
+        self.probes = 0
+        self.guesses = 0
+        self.depth = 0
+        board = [UNKNOWN] * (self.height * self.width)
+        lines = [(True, i) for i in range(self.height)] + [(False, j) for j in range(self.width)]
+        solutions = []
+
+        if self.propagate(board, lines):
+            self._search(board, solutions, max_solutions, lines)
+
+        return [[[int(state == FILLED) for state in solution[i * self.width:(i + 1) * self.width]]
+                 for i in range(self.height)] for solution in solutions]
+
+    # Settles the given lines of the board in place, queueing the crossing lines of every box that changes.
+    # The board is a flat list of the box states row after row, so rows and columns are both plain slices.
+    # Lines are (True, row) or (False, column). Returns False if some line contradicts its guides.
+    # With a changes list, the index of every box set is appended to it so the caller can undo them
+    def propagate(self, board, lines, changes=None):
+        width = self.width
+        queue = deque(lines)
+        queued = set(lines)
+        round_left = 0
+
+        while queue:
+            if not round_left:
+                self.rounds += 1
+                round_left = len(queue)
+            round_left -= 1
+            self.line_solves += 1
+
+            line_id = queue.popleft()
+            queued.discard(line_id)
+            is_row, index = line_id
+
+            if is_row:
+                line = tuple(board[index * width:(index + 1) * width])
+                solved = solve_line(self.row_guides[index], line)
+            else:
+                line = tuple(board[index::width])
+                solved = solve_line(self.col_guides[index], line)
+
+            if solved is None:
+                return False
+            if solved == line:
+                continue
+
+            for i, (old, new) in enumerate(zip(line, solved)):
+                if old == new:
+                    continue
+
+                box = index * width + i if is_row else i * width + index
+                board[box] = new
+                if changes is not None:
+                    changes.append(box)
+
+                crossing = (not is_row, i)
+                if crossing not in queued:
+                    queued.add(crossing)
+                    queue.append(crossing)
+
+        return True
+
+    # Depth-first search over guesses for a board that propagation got stuck on. lines are the lines that changed
+    # since the last time it got stuck, the ones worth probing again
+    def _search(self, board, solutions, max_solutions, lines, depth=1):
+        guess = self._probe(board, lines)
+        if guess is False:
+            return
+        if guess is None:
+            solutions.append(board)
+            return
+
+        if self.max_guesses is not None and self.guesses >= self.max_guesses:
+            self.gave_up = True
+            return
+
+        self.guesses += 1
+        self.depth = max(self.depth, depth)
+        for state in (FILLED, CROSSED):
+            attempt = list(board)
+            attempt[guess] = state
+            changes = [guess]
+            if self.propagate(attempt, self._get_lines(guess), changes):
+                self._search(attempt, solutions, max_solutions, self._get_changed_lines(changes), depth + 1)
+            if len(solutions) >= max_solutions or self.gave_up:
+                return
+
+    # Returns the row and column a box of the board is in
+    def _get_lines(self, box):
+        row, col = divmod(box, self.width)
+        return [(True, row), (False, col)]
+
+    # Returns the lines the boxes are in, each once
+    def _get_changed_lines(self, boxes):
+        lines = set()
+        for box in boxes:
+            row, col = divmod(box, self.width)
+            lines.add((True, row))
+            lines.add((False, col))
+        return lines
+
+    # Returns the unknown boxes of the lines, each once and in board order
+    def _get_unknown_boxes(self, board, lines):
+        boxes = set()
+        for is_row, index in lines:
+            if is_row:
+                boxes.update(range(index * self.width, (index + 1) * self.width))
+            else:
+                boxes.update(range(index, len(board), self.width))
+        return [box for box in sorted(boxes) if board[box] == UNKNOWN]
+
+    # Sets one box and propagates it, returning the boxes that settled as a {box: state} dict,
+    # or None if that contradicts the guides. The board is left as it was
+    def _try_box(self, board, box, state):
+        self.probes += 1
+        board[box] = state
+        changes = [box]
+        consistent = self.propagate(board, self._get_lines(box), changes)
+
+        settled = {other: board[other] for other in changes}
+        for other in changes:
+            board[other] = UNKNOWN
+
+        return settled if consistent else None
+
+    # Tries both states of the unknown boxes in the lines, up to max_probes boxes. A state that leads to
+    # a contradiction settles the box to the other one, and boxes that come out the same in both attempts are
+    # settled too. Repeats on the lines that settling changed, then returns the box whose attempts settled the most
+    # boxes to guess on (the first unknown box if none was probed), None if the board is complete or False if it
+    # can't be completed
+    def _probe(self, board, lines):
+        best = None
+        best_settled = -1
+        probes_left = self.max_probes
+
+        while lines and probes_left:
+            next_lines = set()
+
+            for box in self._get_unknown_boxes(board, lines):
+                if not probes_left:
+                    break
+                if board[box] != UNKNOWN:
+                    continue
+
+                probes_left -= 1
+                filled = self._try_box(board, box, FILLED)
+                crossed = self._try_box(board, box, CROSSED)
+                if filled is None and crossed is None:
+                    return False
+
+                if filled is None or crossed is None:
+                    settled = crossed or filled
+                else:
+                    settled = {other: state for other, state in filled.items() if crossed.get(other) == state}
+
+                if settled:
+                    changes = list(settled)
+                    for other, state in settled.items():
+                        board[other] = state
+                    if not self.propagate(board, self._get_changed_lines(settled), changes):
+                        return False
+                    next_lines |= self._get_changed_lines(changes)
+                elif len(filled) + len(crossed) > best_settled:
+                    best = box
+                    best_settled = len(filled) + len(crossed)
+
+            lines = next_lines
+
+        if best is not None and board[best] == UNKNOWN:
+            return best
+
+        return next((box for box, state in enumerate(board) if state == UNKNOWN), None)
+
+
+# Returns the solution of the puzzle with the given guides, or None if it has none,
+# and whether that solution is the only one
+def solve(row_guides, col_guides):
+    solutions = Solver(row_guides, col_guides).solve(max_solutions=2)
+    return (solutions[0] if solutions else None), len(solutions) == 1
+
+
+# Solves the named grids from their guides, e.g. python solver.py apple snail
+if __name__ == '__main__':
+    for name in sys.argv[1:]:
+        row_guides, col_guides = decode_guides(load_record(name))
+
+        start = time.perf_counter()
+        solution, unique = solve(row_guides, col_guides)
+        elapsed = time.perf_counter() - start
+
+        if solution is None:
+            print(f'{name}: no solution ({elapsed * 1000:.1f}ms)')
+        else:
+            print(f'{name}: {"unique" if unique else "multiple"} solution ({elapsed * 1000:.1f}ms)')
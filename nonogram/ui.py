@@ -108,4 +108,140 @@ class Button(pg.sprite.Sprite):
 
     def on_mousebutton_down(self, event):
         if event.button == 1 and self.rect.collidepoint(pg.mouse.get_pos()):
-            self.on_click()
\ No newline at end of file
+            self.on_click()
+
+
+class ListBox(pg.sprite.Sprite):
+    BOX_COLOR = (80, 80, 80)
+    BOX_COLOR_LIGHT = (110, 110, 110)
+    SELECTED_COLOR = (60, 90, 130)
+    ROW_HEIGHT = 24
+    HEADER_HEIGHT = 56
+
+    # columns is a list of (title, width) and get_row(i) returns the texts of row i, one per column.
+    # Only the rows in view are rendered, so the list stays fast with any number of rows.
+    # on_column_click(column) is called when the title of a column is clicked, e.g. to sort the rows by it,
+    # and on_update() every frame, e.g. to show rows that changed since the list was opened
+    def __init__(self, position, tooltip, columns, row_count, get_row, on_select, event_manager, tag='',
+                 width=500, height=500, on_column_click=None, on_update=None):
+        super().__init__()
+        self.image = pg.Surface((width, height))
+        self.rect = self.image.get_rect(center=position)
+        self.font = get_ui_font()
+        self.tag = tag
+        self.tooltip = tooltip
+        self.columns = columns
+        self.row_count = row_count
+        self.get_row = get_row
+        self.on_select = on_select
+        self.on_column_click = on_column_click
+        self.on_update = on_update
+        self.visible_rows = (height - self.HEADER_HEIGHT) // self.ROW_HEIGHT
+        self.first_row = 0
+        self.selected = 0
+
+        self.event_manager = event_manager
+        self.event_manager.add_listener(pg.KEYDOWN, self.on_key_down)
+        self.event_manager.add_listener(pg.MOUSEWHEEL, self.on_mousewheel)
+        self.event_manager.add_listener(pg.MOUSEBUTTONDOWN, self.on_mousebutton_down)
+
+        self._redraw()
+
+    def _draw_texts(self, texts, top):
+        x = 10
+        for text, (_, column_width) in zip(texts, self.columns):
+            text_surf = self.font.render(text, True, 'white')
+            self.image.blit(text_surf, text_surf.get_rect(left=x, centery=top + self.ROW_HEIGHT / 2),
+                            (0, 0, column_width - 8, self.ROW_HEIGHT))
+            x += column_width
+
+    def _redraw(self):
+        self.image.fill(pg.Color(self.BOX_COLOR))
+        self.image.fill(pg.Color(self.BOX_COLOR_LIGHT), (0, 0, self.rect.width, 30))
+
+        tooltip_surf = self.font.render(self.tooltip, True, 'white')
+        self.image.blit(tooltip_surf, tooltip_surf.get_rect(left=10, centery=14))
+        self._draw_texts([title for title, _ in self.columns], 30)
+        pg.draw.line(self.image, self.BOX_COLOR_LIGHT,
+                     (0, self.HEADER_HEIGHT - 2), (self.rect.width, self.HEADER_HEIGHT - 2), 2)
+
+        for i in range(self.first_row, min(self.row_count, self.first_row + self.visible_rows)):
+            top = self.HEADER_HEIGHT + (i - self.first_row) * self.ROW_HEIGHT
+            if i == self.selected:
+                self.image.fill(pg.Color(self.SELECTED_COLOR), (0, top, self.rect.width, self.ROW_HEIGHT))
+            self._draw_texts(self.get_row(i), top)
+
+        # Scroll bar
+        if self.row_count > self.visible_rows:
+            track_height = self.rect.height - self.HEADER_HEIGHT
+            thumb_height = max(10, track_height * self.visible_rows / self.row_count)
+            scrolled = self.first_row / (self.row_count - self.visible_rows)
+            thumb_top = self.HEADER_HEIGHT + (track_height - thumb_height) * scrolled
+            pg.draw.rect(self.image, self.BOX_COLOR_LIGHT, (self.rect.width - 8, thumb_top, 6, thumb_height))
+
+        pg.draw.rect(self.image, self.BOX_COLOR_LIGHT, self.image.get_rect(), width=2)
+
+    # Moves the selection to row i and scrolls it into view
+    def select(self, i):
+        self.selected = max(0, min(self.row_count - 1, i))
+        if self.selected < self.first_row:
+            self.first_row = self.selected
+        elif self.selected >= self.first_row + self.visible_rows:
+            self.first_row = self.selected - self.visible_rows + 1
+        self._redraw()
+
+    # Replaces the rows and scrolls back to the first one, or keeps the selected row and scrolling where they were
+    def set_rows(self, row_count, get_row, keep_position=False):
+        self.row_count = row_count
+        self.get_row = get_row
+        if keep_position:
+            self.first_row = max(0, min(self.row_count - self.visible_rows, self.first_row))
+            self.select(self.selected)
+        else:
+            self.first_row = 0
+            self.select(0)
+
+    def update(self):
+        if self.on_update:
+            self.on_update()
+
+    def kill(self):
+        super().kill()
+        self.event_manager.remove_listener(self.on_key_down)
+        self.event_manager.remove_listener(self.on_mousewheel)
+        self.event_manager.remove_listener(self.on_mousebutton_down)
+
+    def on_key_down(self, event):
+        steps = {pg.K_UP: -1, pg.K_DOWN: 1, pg.K_PAGEUP: -self.visible_rows, pg.K_PAGEDOWN: self.visible_rows}
+        if event.key in steps:
+            self.select(self.selected + steps[event.key])
+        elif event.key == pg.K_HOME:
+            self.select(0)
+        elif event.key == pg.K_END:
+            self.select(self.row_count - 1)
+        elif event.key == pg.K_RETURN and self.row_count:
+            self.on_select(self.selected)
+            self.kill()
+
+    def on_mousewheel(self, event):
+        if self.rect.collidepoint(pg.mouse.get_pos()):
+            self.first_row = max(0, min(self.row_count - self.visible_rows, self.first_row - event.y * 3))
+            self._redraw()
+
+    def on_mousebutton_down(self, event):
+        x, y = pg.mouse.get_pos()
+        if event.button != 1 or not self.rect.collidepoint(x, y):
+            return
+
+        if y - self.rect.top >= self.HEADER_HEIGHT:
+            i = self.first_row + (y - self.rect.top - self.HEADER_HEIGHT) // self.ROW_HEIGHT
+            if i < self.row_count:
+                self.on_select(i)
+                self.kill()
+        elif y - self.rect.top >= 30 and self.on_column_click:
+            column_left = self.rect.left + 10
+            for column, (_, column_width) in enumerate(self.columns):
+                if x < column_left + column_width:
+                    self.on_column_click(column)
+                    break
+                column_left += column_width